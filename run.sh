@@ -2,13 +2,15 @@
 
 export PYTHONPATH=$PYTHONPATH:$(pwd)/src
 
-case "$@" in
+case "$1" in
    "slack-bot")
-        python -m slack_bot
+        shift
+        python -m slack_bot "$@"
     ;;
 
     "rag-slack-loader")
-        python -m rag_loader.slack
+        shift
+        python -m rag_loader.slack "$@"
     ;;
 
     "mcp-server")
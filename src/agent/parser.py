@@ -10,6 +10,8 @@ class ReferenceArtifact(BaseModel):
     title: str
     link: str
     content: Optional[str] = None
+    # set while the title is a fallback whose llm title is still being generated
+    title_key: Optional[str] = None
 
 
 class Reference(BaseModel):
@@ -59,7 +61,8 @@ def parse_agent_result(config: AgentConfig, result: Dict[str, Any]) -> Tuple[str
                     continue
                 dedupe_artifact.add(key)
                 reference.artifacts.append(ReferenceArtifact(
-                    title=artifact["title"].strip(), link=artifact["link"].strip()))
+                    title=artifact["title"].strip(), link=artifact["link"].strip(),
+                    title_key=(artifact.get("metadata") or {}).get("title_key")))
             if len(reference.artifacts) > 0:
                 references[message.name].append(reference)
 
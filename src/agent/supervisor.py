@@ -1,13 +1,33 @@
+import time
+import hashlib
+import threading
+from typing import Dict, Optional, Set, Tuple, NamedTuple, Any
+
 from langchain_core.messages import AnyMessage, SystemMessage
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt.chat_agent_executor import AgentState
 from langgraph_supervisor import create_supervisor
 
-from config import AgentConfig, SlackConfig
+from config import AgentConfig, SlackConfig, RagConfig
 from .agent import create_web_research_agent, create_slack_conversation_agent
 
+SUPERVISOR_NAME = "supervisor_agent"
+
+
+class _SupervisorGraphEntry(NamedTuple):
+    fingerprint: str
+    checked_at: float
+    graph: CompiledStateGraph
+
+
+_supervisor_graphs: Dict[Tuple[Any, ...], _SupervisorGraphEntry] = {}
+_supervisor_graphs_lock = threading.Lock()
+# keys whose graph is being checked for changes in the background
+_refreshing: Set[Tuple[Any, ...]] = set()
+
 
 def create_supervisor_graph(agent_config: AgentConfig, slack_config: SlackConfig) -> StateGraph:
     """
@@ -40,7 +60,79 @@ def create_supervisor_graph(agent_config: AgentConfig, slack_config: SlackConfig
         handoff_tool_prefix="delegate_to_",
         output_mode="full_history",
         include_agent_name="inline",
-        supervisor_name="supervisor_agent",
+        supervisor_name=SUPERVISOR_NAME,
     )
 
     return supervisor_graph.compile(checkpointer=agent_config.get_checkpointer(async_mongodb=agent_config.checkpointer_mongodb_async))
+
+
+def _get_supervisor_graph_fingerprint(agent_config: AgentConfig, slack_config: SlackConfig) -> str:
+    """
+    Hash everything that is baked into the graph when it is built: the model and the tool descriptions.
+    System prompts are not part of it, they are pulled on every run.
+    """
+    hasher = hashlib.sha256(agent_config.model.encode())
+    for name in ("google_search_tool", "markitdown_crawler_tool"):
+        hasher.update(agent_config.get_prompt(name).text.encode())
+    for name in ("get_slack_conversation_replies_tool", "get_slack_conversation_history_tool", "search_slack_conversation_tool"):
+        hasher.update(slack_config.get_prompt(name).text.encode())
+    for channel in RagConfig().slack_search_channels:
+        hasher.update(repr(sorted(channel.items())).encode())
+    return hasher.hexdigest()
+
+
+def _refresh_supervisor_graph(key: Tuple[Any, ...], agent_config: AgentConfig, slack_config: SlackConfig,
+                               entry: Optional[_SupervisorGraphEntry]) -> CompiledStateGraph:
+    fingerprint = _get_supervisor_graph_fingerprint(
+        agent_config, slack_config)
+    if entry is not None and entry.fingerprint == fingerprint:
+        _supervisor_graphs[key] = entry._replace(checked_at=time.monotonic())
+        return entry.graph
+
+    logger = agent_config.get_logger()
+    started_at = time.perf_counter()
+    graph = create_supervisor_graph(agent_config, slack_config)
+    logger.info("supervisor graph compiled", fingerprint=fingerprint, rebuild=entry is not None,
+                elapsed=round(time.perf_counter() - started_at, 4))
+    _supervisor_graphs[key] = _SupervisorGraphEntry(
+        fingerprint, time.monotonic(), graph)
+    return graph
+
+
+def _refresh_supervisor_graph_in_background(key: Tuple[Any, ...], agent_config: AgentConfig, slack_config: SlackConfig,
+                                            entry: _SupervisorGraphEntry) -> None:
+    try:
+        _refresh_supervisor_graph(key, agent_config, slack_config, entry)
+    except Exception as e:
+        agent_config.get_logger().warning(
+            "failed to refresh the supervisor graph, keeping the current one", error=str(e))
+        _supervisor_graphs[key] = entry._replace(checked_at=time.monotonic())
+    finally:
+        with _supervisor_graphs_lock:
+            _refreshing.discard(key)
+
+
+def get_supervisor_graph(agent_config: AgentConfig, slack_config: SlackConfig) -> CompiledStateGraph:
+    """
+    Return a compiled supervisor graph shared by every caller.
+
+    Per-request data travels via RunnableConfig.configurable, so the graph is built once and only
+    rebuilt when the model or the tool prompts change. Changes are checked at most once every
+    agent_config.graph_refresh_interval seconds, in a background thread pulling the prompts while the
+    current graph keeps being served. Only the first call waits for the graph to be built.
+    """
+    key = (agent_config.checkpointer_provider,
+           agent_config.checkpointer_mongodb_async)
+    if (entry := _supervisor_graphs.get(key)) is not None:
+        if time.monotonic() - entry.checked_at >= agent_config.graph_refresh_interval:
+            with _supervisor_graphs_lock:
+                if key not in _refreshing:
+                    _refreshing.add(key)
+                    threading.Thread(target=_refresh_supervisor_graph_in_background, args=(
+                        key, agent_config, slack_config, entry), name="supervisor-graph-refresh", daemon=True).start()
+        return entry.graph
+
+    with _supervisor_graphs_lock:
+        if (entry := _supervisor_graphs.get(key)) is not None:
+            return entry.graph
+        return _refresh_supervisor_graph(key, agent_config, slack_config, None)
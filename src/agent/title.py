@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Dict, Optional, Union
+
+from langchain_core.runnables import RunnableConfig
+
+from config import AgentConfig, RagConfig
+from store import TitleStore
+from agent.chain import create_make_title_chain
+
+FALLBACK_TITLE_MAX_LENGTH = 80
+
+# titles generated in the background, by content key, so a burst of calls on one conversation makes one llm call
+_pending_titles: Dict[str, asyncio.Task] = {}
+
+
+def clean_title(title: str) -> str:
+    """Clean a title by removing special characters."""
+    return ''.join(filter(lambda x: x not in "|&/<>\"'\\\n", title))
+
+
+def fallback_title(content: str) -> str:
+    """The first line of the first message, as formatted by message_to_text."""
+    lines = [line.strip() for line in content.splitlines()]
+    for header in ("Message:", "Post:"):
+        if header in lines:
+            lines = lines[lines.index(header) + 1:]
+            break
+    line = next((line for line in lines if line and line != "---"), "")
+    if len(line) > FALLBACK_TITLE_MAX_LENGTH:
+        line = line[:FALLBACK_TITLE_MAX_LENGTH].rsplit(" ", 1)[0] + "..."
+    return clean_title(line)
+
+
+def make_title(config: Union[AgentConfig, RagConfig], title_store: TitleStore, content: str,
+               runnable_config: Optional[RunnableConfig] = None) -> str:
+    key = title_store.get_key(content)
+    if (title := title_store.get_sync(key)) is not None:
+        return title
+    title = clean_title(create_make_title_chain(config).invoke(
+        input={"input": content}, config=runnable_config))
+    title_store.set_sync(key, title)
+    return title
+
+
+async def _generate_title(config: Union[AgentConfig, RagConfig], title_store: TitleStore, key: str, content: str,
+                          runnable_config: Optional[RunnableConfig]) -> str:
+    title = clean_title(await create_make_title_chain(config).ainvoke(
+        input={"input": content}, config=runnable_config))
+    await title_store.set(key, title)
+    return title
+
+
+async def amake_title(config: Union[AgentConfig, RagConfig], title_store: TitleStore, content: str,
+                      runnable_config: Optional[RunnableConfig] = None, fast: bool = False) -> str:
+    """
+    Return the cached title of content, or generate one.
+
+    In fast mode a cache miss returns fallback_title at once, while the llm title is generated in the
+    background and cached for the next call on the same content. is_title_pending tells such a fallback
+    apart, and wait_for_title gets the llm title to replace it with once the answer is posted.
+    """
+    key = title_store.get_key(content)
+    if (title := await title_store.get(key)) is not None:
+        return title
+
+    if key not in _pending_titles:
+        # the background run must not report into the tool call that started it
+        task = asyncio.create_task(_generate_title(
+            config, title_store, key, content, None if fast else runnable_config))
+        _pending_titles[key] = task
+        task.add_done_callback(lambda _: _pending_titles.pop(key, None))
+        if fast:
+            task.add_done_callback(partial(_log_failed_title, config.get_logger()))
+    if fast:
+        return fallback_title(content)
+    return await asyncio.shield(_pending_titles[key])
+
+
+def is_title_pending(key: str) -> bool:
+    return key in _pending_titles
+
+
+async def wait_for_title(title_store: TitleStore, key: str) -> Optional[str]:
+    """The title of the content key once its background generation is done, None if it failed."""
+    if (task := _pending_titles.get(key)) is not None:
+        await asyncio.wait([task])
+    return await title_store.get(key)
+
+
+def _log_failed_title(logger: logging.Logger, task: asyncio.Task) -> None:
+    if not task.cancelled() and (e := task.exception()) is not None:
+        logger.warning("failed to generate conversation title", error=str(e))
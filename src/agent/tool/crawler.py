@@ -0,0 +1,250 @@
+import io
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+import ua_generator
+from markitdown import MarkItDown, StreamInfo
+
+from config.http import HttpConfig
+
+# the response headers kept in a cache entry, to convert the body and to revalidate it
+CACHED_HEADERS = ("content-type", "content-disposition", "cache-control", "expires", "date", "etag", "last-modified")
+
+# without explicit freshness a response stays fresh for 10% of its age since it was last modified, up to a day (RFC 9111 4.2.2)
+HEURISTIC_FRESHNESS_FRACTION = 0.1
+HEURISTIC_FRESHNESS_MAX = 24 * 60 * 60
+
+# the cache directory is pruned to max_entries after this many writes
+PRUNE_INTERVAL = 100
+
+
+def _parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Crawler:
+    """
+    Fetch web pages as markdown through the shared connection pools, with an on-disk cache.
+
+    Each url keeps one cache entry with the validators and freshness of its last response and the
+    markdown converted from its body. A fresh entry is served without a request, a stale one is
+    revalidated with If-None-Match/If-Modified-Since, and a body whose hash did not change is not
+    converted again. Responses with Cache-Control: no-store are never written.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_entries: int, http_config: HttpConfig, logger: logging.Logger):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.http_config = http_config
+        self.logger = logger
+        # one browser identity per process instead of a new one per page
+        self.headers = ua_generator.generate(device="desktop", platform=(
+            "windows", "macos"), browser=("chrome", "edge", "firefox", "safari")).headers.get()
+        self.markitdown = MarkItDown(enable_plugins=False)
+        # requests sessions are not thread safe and crawl() runs in several threads, each gets its own
+        self._local = threading.local()
+        self._stats: Counter = Counter()
+        self._writes = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_requests_session(self) -> requests.Session:
+        if (session := getattr(self._local, "session", None)) is None:
+            session = self._local.session = self.http_config.create_requests_session()
+            session.headers.update(self.headers)
+            session.verify = False
+        return session
+
+    def _get_path(self, url: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        if (path := self._get_path(url)) is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, url: str, entry: Dict[str, Any]) -> None:
+        if (path := self._get_path(url)) is None:
+            return
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(entry, file, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_INTERVAL == 0
+        if prune:
+            self._prune()
+
+    def _prune(self) -> None:
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _get_freshness_lifetime(headers: Mapping[str, str], stored_at: float) -> float:
+        cache_control = _parse_cache_control(headers.get("cache-control"))
+        if "no-cache" in cache_control:
+            return 0
+        if (max_age := cache_control.get("max-age")) is not None and max_age.isdigit():
+            return int(max_age)
+        if "expires" in headers:
+            expires = _parse_http_date(headers["expires"])
+            date = _parse_http_date(headers.get("date")) or stored_at
+            return max(expires - date, 0) if expires is not None else 0
+        if (last_modified := _parse_http_date(headers.get("last-modified"))) is not None:
+            date = _parse_http_date(headers.get("date")) or stored_at
+            return min(max(date - last_modified, 0) * HEURISTIC_FRESHNESS_FRACTION, HEURISTIC_FRESHNESS_MAX)
+        return 0
+
+    @classmethod
+    def _get_fresh_until(cls, headers: Mapping[str, str], age: Optional[str], stored_at: float) -> float:
+        """The time the response stops being fresh, less the Age it already spent in upstream caches (RFC 9111 4.2.3)."""
+        current_age = int(age) if age is not None and age.strip().isdigit() else 0
+        return stored_at + max(cls._get_freshness_lifetime(headers, stored_at) - current_age, 0)
+
+    def _get_conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if "etag" in entry["headers"]:
+                headers["If-None-Match"] = entry["headers"]["etag"]
+            if "last-modified" in entry["headers"]:
+                headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+        return headers
+
+    def _lookup(self, url: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """The cache entry of url and whether it is fresh."""
+        entry = self._load(url)
+        return entry, entry is not None and entry["fresh_until"] > time.time()
+
+    def _revalidated(self, url: str, entry: Dict[str, Any], headers: Mapping[str, str]) -> Tuple[str, str]:
+        """Refresh an entry the server answered 304 Not Modified for."""
+        self._count("revalidated")
+        entry["headers"].update({name: headers[name] for name in CACHED_HEADERS if name in headers})
+        entry["fresh_until"] = self._get_fresh_until(entry["headers"], headers.get("age"), time.time())
+        self._save(url, entry)
+        return entry["title"], entry["markdown"]
+
+    def _convert(self, url: str, entry: Optional[Dict[str, Any]], final_url: str, headers: Mapping[str, str], body: bytes) -> Tuple[str, str]:
+        """Convert a downloaded body unless the cached one had the same content, and cache the result."""
+        self._count("miss")
+        content_hash = hashlib.sha256(body).hexdigest()
+        if entry is not None and entry["content_hash"] == content_hash:
+            self._count("markdown_hit")
+            title, markdown = entry["title"], entry["markdown"]
+        else:
+            result = self.markitdown.convert_stream(io.BytesIO(body), stream_info=self._get_stream_info(final_url, headers))
+            title, markdown = result.title, result.markdown.strip()
+
+        # the age is only true at download time, it is not cached with the other headers
+        age = headers.get("age")
+        headers = {name: headers[name] for name in CACHED_HEADERS if name in headers}
+        if "no-store" not in _parse_cache_control(headers.get("cache-control")):
+            stored_at = time.time()
+            self._save(url, {
+                "url": final_url,
+                "headers": headers,
+                "fresh_until": self._get_fresh_until(headers, age, stored_at),
+                "content_hash": content_hash,
+                "title": title,
+                "markdown": markdown,
+            })
+        return title, markdown
+
+    @staticmethod
+    def _get_stream_info(url: str, headers: Mapping[str, str]) -> StreamInfo:
+        mimetype, charset, filename = None, None, None
+        if "content-type" in headers:
+            mimetype, *parameters = [part.strip() for part in headers["content-type"].split(";")]
+            charset = next((parameter.split("=", 1)[1].strip() for parameter in parameters
+                            if parameter.startswith("charset=")), None) or None
+        if (match := re.search(r"filename=([^;]+)", headers.get("content-disposition", ""))) is not None:
+            filename = match.group(1).strip("\"'")
+        path = filename or urlparse(url).path
+        return StreamInfo(mimetype=mimetype, charset=charset, filename=filename or os.path.basename(path) or None,
+                          extension=os.path.splitext(path)[1] or None, url=url)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def crawl(self, url: str) -> Tuple[str, str]:
+        """Return the title and markdown of url."""
+        if urlparse(url).scheme not in ("http", "https"):
+            result = self.markitdown.convert_uri(url)
+            return result.title, result.markdown.strip()
+
+        entry, fresh = self._lookup(url)
+        if fresh:
+            self._count("hit")
+            return entry["title"], entry["markdown"]
+
+        response = self._get_requests_session().get(url, headers=self._get_conditional_headers(entry))
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        if response.status_code == 304 and entry is not None:
+            return self._revalidated(url, entry, headers)
+        response.raise_for_status()
+        return self._convert(url, entry, response.url, headers, response.content)
+
+    async def acrawl(self, url: str) -> Tuple[str, str]:
+        if urlparse(url).scheme not in ("http", "https"):
+            return await asyncio.to_thread(self.crawl, url)
+
+        entry, fresh = await asyncio.to_thread(self._lookup, url)
+        if fresh:
+            self._count("hit")
+            return entry["title"], entry["markdown"]
+
+        session = self.http_config.get_aiohttp_session()
+        async with session.get(url, headers={**self.headers, **self._get_conditional_headers(entry)}, ssl=False) as response:
+            headers = {name.lower(): value for name, value in response.headers.items()}
+            if response.status == 304 and entry is not None:
+                return await asyncio.to_thread(self._revalidated, url, entry, headers)
+            response.raise_for_status()
+            body = await response.read()
+            final_url = str(response.url)
+        # conversion parses the whole page, keep it off the event loop
+        return await asyncio.to_thread(self._convert, url, entry, final_url, headers, body)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats.get("hit", 0) + stats.get("revalidated", 0) + stats.get("miss", 0)
+        stats["hit_ratio"] = round((stats.get("hit", 0) + stats.get("revalidated", 0)) / requests, 3) if requests else None
+        stats["markdown_hit_ratio"] = round((requests - stats.get("miss", 0) + stats.get("markdown_hit", 0)) / requests, 3) if requests else None
+        return stats
@@ -3,7 +3,6 @@ from typing import List, Tuple, Annotated, Optional
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolArg
 from langchain.tools import BaseTool, tool
-from langchain_google_community import GoogleSearchAPIWrapper
 
 from config import AgentConfig, RagConfig
 from .types import Artifact
@@ -16,9 +15,7 @@ def create_google_search_tool(config: AgentConfig) -> BaseTool:
 
         rag_config: RagConfig = RagConfig.from_runnable_config(config)
         top_n = num_results or rag_config.google_search_default_top_n
-        google_search_api = GoogleSearchAPIWrapper(
-            google_api_key=rag_config.google_api_key, google_cse_id=rag_config.google_cse_id)
-        results = google_search_api.results(query, num_results=top_n)
+        results = rag_config.get_google_search_api().results(query, num_results=top_n)
 
         artifacts = [Artifact(title=result["title"], link=result["link"],
                               content=result["snippet"]) for result in results]
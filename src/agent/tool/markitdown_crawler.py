@@ -1,35 +1,46 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import urllib3
-import requests
-import ua_generator
-from markitdown import MarkItDown
-from langchain.tools import BaseTool, tool
+from langchain_core.tools import StructuredTool
+from langchain.tools import BaseTool
 
 from config import AgentConfig
+from config.http import HttpConfig
+from .crawler import Crawler
+from .passages import extract_passages
 from .types import Artifact
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+_crawler: Optional[Crawler] = None
+
 
 def create_markitdown_crawler_tool(config: AgentConfig) -> BaseTool:
-    @tool(response_format="content_and_artifact")
-    def markitdown_crawler(url: str) -> Tuple[str, List[Artifact]]:
-        "prompt_name: markitdown_crawler_tool"
+    global _crawler
+
+    if _crawler is None:
+        _crawler = Crawler(config.crawler_cache_dir, config.crawler_cache_max_entries,
+                           HttpConfig(), config.get_logger())
 
-        user_agent = ua_generator.generate(device="desktop", platform=(
-            "windows", "macos"), browser=("chrome", "edge", "firefox", "safari"))
-        requests_session = requests.Session()
-        requests_session.headers.update(user_agent.headers.get())
-        requests_session.verify = False
-        markitdown = MarkItDown(enable_plugins=False,
-                                requests_session=requests_session)
-        result = markitdown.convert_url(url)
-        content = result.markdown.strip()
+    def to_result(url: str, query: Optional[str], title: str, content: str) -> Tuple[str, List[Artifact]]:
+        # the agent only reads the relevant passages, the artifact keeps the whole page
+        extracted = extract_passages(content, query, config.crawler_extract_budget, config.crawler_passage_length) \
+            if query and config.crawler_extract_budget > 0 else content
+        _crawler.logger.debug("markitdown_crawler crawled", url=url, length=len(content),
+                              extracted_length=len(extracted), stats=_crawler.stats())
+        return extracted, [Artifact(title=title, link=url, content=content)]
+
+    def markitdown_crawler(url: str, query: Optional[str] = None) -> Tuple[str, List[Artifact]]:
+        "prompt_name: markitdown_crawler_tool"
 
-        return content, [Artifact(title=result.title, link=url, content=content)]
+        return to_result(url, query, *_crawler.crawl(url))
 
-    markitdown_crawler.description = config.get_prompt(
-        "markitdown_crawler_tool").text
+    async def amarkitdown_crawler(url: str, query: Optional[str] = None) -> Tuple[str, List[Artifact]]:
+        return to_result(url, query, *await _crawler.acrawl(url))
 
-    return markitdown_crawler
+    return StructuredTool.from_function(
+        func=markitdown_crawler,
+        coroutine=amarkitdown_crawler,
+        description=config.get_prompt("markitdown_crawler_tool").text,
+        response_format="content_and_artifact",
+    )
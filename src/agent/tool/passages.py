@@ -0,0 +1,79 @@
+import math
+from collections import Counter
+from typing import List
+
+from .sparse import tokenize
+
+PASSAGE_SEPARATOR = "\n\n...\n\n"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def split_passages(markdown: str, max_length: int) -> List[str]:
+    """
+    Split markdown into passages of about max_length characters between its paragraphs.
+
+    Each passage starts with the heading it is under, so a passage picked on its own still says what it
+    is about. A paragraph longer than max_length is a passage of its own.
+    """
+    passages: List[str] = []
+    heading, current = "", ""
+    for paragraph in markdown.split("\n\n"):
+        if not (paragraph := paragraph.strip("\n")):
+            continue
+        # a heading alone is no passage, it stays with the paragraph after it whatever the length
+        if paragraph.startswith("#"):
+            if current and current != heading:
+                passages.append(current)
+            heading, current = paragraph.split("\n", 1)[0], ""
+        if current and current != heading and len(current) + len(paragraph) + 2 > max_length:
+            passages.append(current)
+            current = ""
+        if not current and heading and not paragraph.startswith("#"):
+            current = heading
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current and (current != heading or not passages):
+        passages.append(current)
+    return passages
+
+
+def extract_passages(markdown: str, query: str, budget: int, passage_length: int) -> str:
+    """
+    Keep the passages of markdown most relevant to query within budget characters, in page order.
+
+    Passages are scored with BM25 against the page itself, with the same tokens as the lexical search
+    vectors. A page within budget, or a query without any token, is returned as is.
+    """
+    if len(markdown) <= budget:
+        return markdown
+    query_tokens = set(tokenize(query))
+    if not query_tokens:
+        return markdown
+
+    passages = split_passages(markdown, passage_length)
+    counts = [Counter(tokenize(passage)) for passage in passages]
+    lengths = [sum(count.values()) for count in counts]
+    average_length = sum(lengths) / len(lengths) or 1
+    frequencies = Counter(token for count in counts for token in query_tokens & count.keys())
+
+    scores = []
+    for count, length in zip(counts, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores.append(sum(
+            math.log(1 + (len(passages) - frequencies[token] + 0.5) / (frequencies[token] + 0.5))
+            * count[token] * (BM25_K1 + 1) / (count[token] + norm)
+            for token in query_tokens if token in count))
+
+    selected, used = set(), 0
+    for idx in sorted(range(len(passages)), key=lambda idx: scores[idx], reverse=True):
+        if scores[idx] <= 0:
+            break
+        if used + len(passages[idx]) + len(PASSAGE_SEPARATOR) > budget:
+            continue
+        selected.add(idx)
+        used += len(passages[idx]) + len(PASSAGE_SEPARATOR)
+    if not selected:
+        # nothing on the page matches, its beginning is the best summary
+        return markdown[:budget]
+    return PASSAGE_SEPARATOR.join(passages[idx] for idx in sorted(selected))
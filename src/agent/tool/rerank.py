@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import google.auth
+from google.auth.credentials import Credentials
+from google.auth.transport.requests import Request
+from google.api_core.exceptions import GoogleAPIError
+from google.cloud import discoveryengine_v1 as discoveryengine
+
+from config import RagConfig
+from .types import Artifact
+
+_rerankers: Dict[str, "Reranker"] = {}
+_credentials: Optional[Tuple[Credentials, str]] = None
+_credentials_lock = threading.Lock()
+
+
+def _get_credentials() -> Tuple[Credentials, str]:
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = google.auth.default()
+        return _credentials
+
+
+async def _aget_credentials() -> Tuple[Credentials, str]:
+    """
+    _get_credentials with a valid token, loaded and refreshed in a thread.
+
+    Finding the credentials and refreshing the token are blocking http calls, which the async client
+    would otherwise make on the event loop before its first call and whenever the token expires.
+    """
+    credentials = _credentials if _credentials is not None else await asyncio.to_thread(_get_credentials)
+    if not credentials[0].valid:
+        await asyncio.to_thread(credentials[0].refresh, Request())
+    return credentials
+
+
+class Reranker:
+    """
+    Rerank search results with the discovery engine ranking api, sharing one client and its credentials.
+
+    The api scores each record against the query on its own, so scores are cached by (query, document id)
+    and only the records without a cached score are sent. Results are returned in vector order when
+    reranking cannot change them (no more candidates than top_n), or when the api misses its deadline.
+    """
+
+    def __init__(self, model: str, cache_size: int, timeout: float, logger: logging.Logger):
+        self.model = model
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.logger = logger
+        self._client: Optional[discoveryengine.RankServiceClient] = None
+        self._async_client: Optional[discoveryengine.RankServiceAsyncClient] = None
+        self._scores: OrderedDict[Tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_client(self) -> discoveryengine.RankServiceClient:
+        if self._client is None:
+            self._client = discoveryengine.RankServiceClient(credentials=_get_credentials()[0])
+        return self._client
+
+    def _get_async_client(self) -> discoveryengine.RankServiceAsyncClient:
+        if self._async_client is None:
+            self._async_client = discoveryengine.RankServiceAsyncClient(credentials=_get_credentials()[0])
+        return self._async_client
+
+    def _build_request(self, query: str, artifacts: List[Artifact], ids: List[str]) -> Optional[discoveryengine.RankRequest]:
+        """The request for the artifacts without a cached score, None when every score is cached."""
+        with self._lock:
+            missing = [idx for idx, id in enumerate(ids) if (query, id) not in self._scores]
+        if not missing:
+            return None
+        return discoveryengine.RankRequest(
+            ranking_config=discoveryengine.RankServiceClient.ranking_config_path(
+                project=_get_credentials()[1],
+                location="global",
+                ranking_config="default_ranking_config",
+            ),
+            model=self.model,
+            top_n=len(missing),
+            query=query,
+            records=[discoveryengine.RankingRecord(id=str(idx), title=artifacts[idx]["title"],
+                                                   content=artifacts[idx]["content"]) for idx in missing],
+        )
+
+    def _store_scores(self, query: str, ids: List[str], response: discoveryengine.RankResponse) -> None:
+        with self._lock:
+            for record in response.records:
+                self._scores[(query, ids[int(record.id)])] = record.score
+                self._scores.move_to_end((query, ids[int(record.id)]))
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def _order(self, query: str, artifacts: List[Artifact], ids: List[str], top_n: int) -> List[Artifact]:
+        with self._lock:
+            scores: Dict[int, float] = {idx: score for idx, id in enumerate(ids)
+                                        if (score := self._scores.get((query, id))) is not None}
+        if len(scores) < len(artifacts):
+            # the api missed its deadline, the vector order is the best we have
+            return artifacts[:top_n]
+        reranked = []
+        for idx in sorted(scores, key=lambda idx: scores[idx], reverse=True)[:top_n]:
+            artifacts[idx]["metadata"]["rerank_score"] = scores[idx]
+            reranked.append(artifacts[idx])
+        return reranked
+
+    def rerank(self, query: str, artifacts: List[Artifact], ids: List[str], top_n: int) -> List[Artifact]:
+        """Return the top_n artifacts by relevance to query, ids identify the artifacts for the score cache."""
+        if len(artifacts) <= top_n:
+            return artifacts
+        if (request := self._build_request(query, artifacts, ids)) is not None:
+            try:
+                response = self._get_client().rank(request=request, timeout=self.timeout)
+                self.logger.debug("reranker rank", response=response)
+                self._store_scores(query, ids, response)
+            except GoogleAPIError as e:
+                self.logger.warning("rerank failed, keeping vector order", error=str(e))
+        return self._order(query, artifacts, ids, top_n)
+
+    async def arerank(self, query: str, artifacts: List[Artifact], ids: List[str], top_n: int) -> List[Artifact]:
+        if len(artifacts) <= top_n:
+            return artifacts
+        await _aget_credentials()
+        if (request := self._build_request(query, artifacts, ids)) is not None:
+            try:
+                response = await self._get_async_client().rank(request=request, timeout=self.timeout)
+                self.logger.debug("reranker rank", response=response)
+                self._store_scores(query, ids, response)
+            except GoogleAPIError as e:
+                self.logger.warning("rerank failed, keeping vector order", error=str(e))
+        return self._order(query, artifacts, ids, top_n)
+
+
+def get_reranker(config: RagConfig) -> Reranker:
+    """The reranker of the configured model, shared by every search of the process."""
+    if config.rerank_model not in _rerankers:
+        _rerankers[config.rerank_model] = Reranker(
+            config.rerank_model, config.rerank_cache_size, config.rerank_timeout, config.get_logger())
+    return _rerankers[config.rerank_model]
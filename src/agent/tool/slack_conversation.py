@@ -1,151 +1,184 @@
-from typing import List, Tuple, Annotated, Optional
+import asyncio
+from typing import Iterable, List, Tuple, Annotated, Optional
 
 from langchain_core.runnables import RunnableConfig
-from langchain_core.tools import InjectedToolArg
-from langchain.tools import BaseTool, tool
+from langchain_core.tools import InjectedToolArg, StructuredTool
+from langchain.tools import BaseTool
 from qdrant_client import models
-import google.auth
-from google.cloud import discoveryengine_v1 as discoveryengine
 
 from config import SlackConfig, AgentConfig, RagConfig
+from config.http import HttpConfig
 
-from slack_bot.client import SlackClient
-from slack_bot.types import message_to_text
-from agent.chain import create_make_title_chain
+from store import TitleStore
+from slack_bot.client import SlackClient, SlackAsyncClient
+from slack_bot.types import SlackMessage, message_to_text
+from agent.title import clean_title, make_title, amake_title, is_title_pending
 from .types import Artifact
-from .utils import clean_title
+from .rerank import get_reranker
+from .sparse import DENSE_VECTOR_NAME, SPARSE_VECTOR_NAME, LexicalSparseEmbeddings
 _slack_client: Optional[SlackClient] = None
+_slack_async_client: Optional[SlackAsyncClient] = None
+_http_config: Optional[HttpConfig] = None
 
 
-def create_get_slack_conversation_replies_tool(config: SlackConfig) -> BaseTool:
-    global _slack_client
+def _init_slack_clients(config: SlackConfig) -> None:
+    global _slack_client, _slack_async_client, _http_config
 
     if _slack_client is None:
         _slack_client = SlackClient(config)
+    if _slack_async_client is None:
+        _slack_async_client = SlackAsyncClient(config)
+        _http_config = HttpConfig()
 
-    @tool(response_format="content_and_artifact")
-    def get_slack_conversation_replies(url: str, single_message: bool = False, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
-        "prompt_name: get_slack_conversation_replies_tool"
 
-        channel_id, ts = _slack_client.get_thread_url_info(
-            url, not single_message)
+def _get_slack_async_client() -> SlackAsyncClient:
+    # the shared session belongs to the running event loop and is reopened after the bot closed it
+    _slack_async_client.client.session = _http_config.get_aiohttp_session()
+    return _slack_async_client
 
-        replies = _slack_client.fetch_conversations_replies(
-            channel_id, ts)
 
-        contents = [message_to_text(reply) for reply in replies]
-        content = "\n\n---\n\n".join(
-            [content for content in contents if content is not None])
+def _join_messages(messages: Iterable[SlackMessage]) -> str:
+    contents = [message_to_text(message) for message in messages]
+    return "\n\n---\n\n".join(
+        [content for content in contents if content is not None])
 
-        agent_config = AgentConfig.from_runnable_config(config)
-        title = create_make_title_chain(agent_config).invoke(
-            input={"input": content}, config=config)
-        artifacts = [Artifact(title=clean_title(title),
-                              link=url, content=content)]
-        return content, artifacts
 
-    get_slack_conversation_replies.description = config.get_prompt(
-        "get_slack_conversation_replies_tool").text
+def _make_artifacts(url: str, content: str, title: str, title_key: Optional[str] = None) -> List[Artifact]:
+    return [Artifact(title=title, link=url, content=content, metadata={"title_key": title_key} if title_key else None)]
 
-    return get_slack_conversation_replies
 
+def _get_pending_title_key(title_store: TitleStore, content: str) -> Optional[str]:
+    # a fallback title, the bot replaces it in its posted reply once the llm title is generated
+    key = title_store.get_key(content)
+    return key if is_title_pending(key) else None
 
-def create_get_slack_conversation_history_tool(config: SlackConfig) -> BaseTool:
-    global _slack_client
 
-    if _slack_client is None:
-        _slack_client = SlackClient(config)
+def create_get_slack_conversation_replies_tool(config: SlackConfig) -> BaseTool:
+    """
+    The tool has a sync body for the MCP server and streamlit and a native async one for the agent graph,
+    so concurrent tool calls of the bot wait on the event loop instead of holding a thread each.
+    """
+    _init_slack_clients(config)
 
-    @tool(response_format="content_and_artifact")
-    def get_slack_conversation_history(url: str, message_count: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
-        "prompt_name: get_slack_conversation_history_tool"
+    def get_slack_conversation_replies(url: str, single_message: bool = False, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        "prompt_name: get_slack_conversation_replies_tool"
 
-        channel_id = _slack_client.get_channel_url_info(url)
+        channel_id, ts = _slack_client.get_thread_url_info(
+            url, not single_message)
+        content = _join_messages(
+            _slack_client.iter_conversations_replies(channel_id, ts))
 
-        history = _slack_client.fetch_conversations_history(
-            channel_id, 1, message_count or 10)
+        agent_config = AgentConfig.from_runnable_config(config)
+        title = make_title(agent_config, agent_config.get_title_store(), content, config)
+        return content, _make_artifacts(url, content, title)
 
-        contents = [message_to_text(message)
-                    for page in history["pages"]
-                    for message in page["messages"]]
-        content = "\n\n---\n\n".join(
-            [content for content in contents if content is not None])
+    async def aget_slack_conversation_replies(url: str, single_message: bool = False, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        slack_client = _get_slack_async_client()
+        channel_id, ts = slack_client.get_thread_url_info(
+            url, not single_message)
+        content = _join_messages([reply async for reply in slack_client.iter_conversations_replies(channel_id, ts)])
 
-        content = "\n\n---\n\n".join(contents)
         agent_config = AgentConfig.from_runnable_config(config)
-        title = create_make_title_chain(agent_config).invoke(
-            input={"input": content}, config=config)
-        artifacts = [Artifact(title=clean_title(title),
-                              link=url, content=content)]
-        return content, artifacts
+        title_store = agent_config.get_title_store()
+        title = await amake_title(agent_config, title_store, content, config, agent_config.title_fast)
+        return content, _make_artifacts(url, content, title, _get_pending_title_key(title_store, content))
 
-    get_slack_conversation_history.description = config.get_prompt(
-        "get_slack_conversation_history_tool").text
+    return StructuredTool.from_function(
+        func=get_slack_conversation_replies,
+        coroutine=aget_slack_conversation_replies,
+        description=config.get_prompt(
+            "get_slack_conversation_replies_tool").text,
+        response_format="content_and_artifact",
+    )
 
-    return get_slack_conversation_history
 
+def create_get_slack_conversation_history_tool(config: SlackConfig) -> BaseTool:
+    """The history counterpart of create_get_slack_conversation_replies_tool, with sync and async bodies."""
+    _init_slack_clients(config)
 
-def create_search_slack_conversation_tool(config: SlackConfig) -> BaseTool:
-    @tool(response_format="content_and_artifact")
-    def search_slack_conversation(query: str, channel_ids: Optional[List[str]] = None, num_results: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
-        "prompt_name: search_slack_conversation_tool"
+    def get_slack_conversation_history(url: str, message_count: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        "prompt_name: get_slack_conversation_history_tool"
 
-        rag_config: RagConfig = RagConfig.from_runnable_config(config)
-        logger = rag_config.get_logger()
+        channel_id = _slack_client.get_channel_url_info(url)
+        content = _join_messages(
+            _slack_client.iter_conversations_history(channel_id, limit=message_count or 10))
 
-        top_n = num_results or rag_config.slack_search_default_top_n
+        agent_config = AgentConfig.from_runnable_config(config)
+        title = make_title(agent_config, agent_config.get_title_store(), content, config)
+        return content, _make_artifacts(url, content, title)
+
+    async def aget_slack_conversation_history(url: str, message_count: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        slack_client = _get_slack_async_client()
+        channel_id = slack_client.get_channel_url_info(url)
+        content = _join_messages([message async for message in slack_client.iter_conversations_history(
+            channel_id, limit=message_count or 10)])
 
-        qdrant_client = rag_config.get_qdrant_config().get_qdrant_client()
+        agent_config = AgentConfig.from_runnable_config(config)
+        title_store = agent_config.get_title_store()
+        title = await amake_title(agent_config, title_store, content, config, agent_config.title_fast)
+        return content, _make_artifacts(url, content, title, _get_pending_title_key(title_store, content))
+
+    return StructuredTool.from_function(
+        func=get_slack_conversation_history,
+        coroutine=aget_slack_conversation_history,
+        description=config.get_prompt(
+            "get_slack_conversation_history_tool").text,
+        response_format="content_and_artifact",
+    )
+
+
+def _query_slack_points(rag_config: RagConfig, query: str, vector: List[float], channel_ids: Optional[List[str]], top_n: int) -> List[models.ScoredPoint]:
+    """Dense search, or dense and lexical searches fused by reciprocal rank, over-fetching when the results get reranked."""
+    query_filter = models.Filter(
+        must=[
+            models.FieldCondition(
+                key="metadata.channel_id",
+                match=models.MatchAny(any=channel_ids),
+            )
+        ]
+    ) if channel_ids else None
+    candidates = int(
+        round(top_n * rag_config.slack_search_rerank_top_n_multiplier))
+    limit = candidates if rag_config.slack_search_reranked else top_n
+
+    qdrant_client = rag_config.get_qdrant_config().get_qdrant_client()
+    if rag_config.slack_search_hybrid:
+        sparse_vector = LexicalSparseEmbeddings().embed_query(query)
         results = qdrant_client.query_points(
             collection_name=rag_config.slack_search_collection_name,
-            query=rag_config.load_embeddings_model().embed_query(query),
-            query_filter=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="metadata.channel_id",
-                        match=models.MatchAny(any=channel_ids),
-                    )
-                ]
-            ) if channel_ids else None,
-            limit=int(
-                round(top_n * rag_config.slack_search_rerank_top_n_multiplier)),
+            prefetch=[
+                models.Prefetch(query=vector, using=DENSE_VECTOR_NAME, filter=query_filter,
+                                limit=candidates, score_threshold=rag_config.slack_search_top_p),
+                models.Prefetch(query=models.SparseVector(indices=sparse_vector.indices, values=sparse_vector.values),
+                                using=SPARSE_VECTOR_NAME, filter=query_filter, limit=candidates),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            limit=limit,
+        )
+    else:
+        results = qdrant_client.query_points(
+            collection_name=rag_config.slack_search_collection_name,
+            query=vector,
+            query_filter=query_filter,
+            limit=limit,
             score_threshold=rag_config.slack_search_top_p,
         )
+    rag_config.get_logger().debug(
+        "search_slack_conversation qdrant_client.query_points", results=results,
+        embeddings_cache=rag_config.load_embeddings_model().stats())
+    return results.points
+
+
+def _points_to_artifacts(points: List[models.ScoredPoint]) -> List[Artifact]:
+    return [Artifact(title=clean_title(point.payload["metadata"]["title"]),
+                     link=point.payload["metadata"]["source"],
+                     content=point.payload["page_content"],
+                     metadata={"vector_score": point.score, **{k: v for k, v in point.payload["metadata"].items() if k not in {"title", "source"}}})
+            for point in points]
+
 
-        logger.debug(
-            "search_slack_conversation qdrant_client.query_points", results=results)
-
-        artifacts = [Artifact(title=clean_title(point.payload["metadata"]["title"]),
-                              link=point.payload["metadata"]["source"],
-                              content=point.payload["page_content"],
-                              metadata={"vector_score": point.score, **{k: v for k, v in point.payload["metadata"].items() if k not in {"title", "source"}}})
-                     for point in results.points]
-
-        discoveryengine_client = discoveryengine.RankServiceClient()
-        _, project_id = google.auth.default()
-        response = discoveryengine_client.rank(request=discoveryengine.RankRequest(
-            ranking_config=discoveryengine_client.ranking_config_path(
-                project=project_id,
-                location="global",
-                ranking_config="default_ranking_config",
-            ),
-            model=rag_config.rerank_model,
-            top_n=top_n,
-            query=query,
-            records=[discoveryengine.RankingRecord(id=str(
-                idx), title=artifact["title"], content=artifact["content"], ) for idx, artifact in enumerate(artifacts)],
-        ))
-
-        logger.debug(
-            "search_slack_conversation discoveryengine_client.rank", response=response)
-
-        reranked_artifacts = []
-        for record in response.records:
-            artifact = artifacts[int(record.id)]
-            artifact["metadata"]["rerank_score"] = record.score
-            reranked_artifacts.append(artifact)
-
-        content = "\n===\n".join([f"""
+def _format_artifacts(artifacts: List[Artifact]) -> str:
+    return "\n===\n".join([f"""
 <title>
 {artifact["title"]}
 </title>
@@ -155,18 +188,50 @@ def create_search_slack_conversation_tool(config: SlackConfig) -> BaseTool:
 <content>
 {artifact["content"]}
 </content>
-""" for artifact in reranked_artifacts])
+""" for artifact in artifacts])
+
+
+def create_search_slack_conversation_tool(config: SlackConfig) -> BaseTool:
+    def search_slack_conversation(query: str, channel_ids: Optional[List[str]] = None, num_results: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        "prompt_name: search_slack_conversation_tool"
+
+        rag_config: RagConfig = RagConfig.from_runnable_config(config)
+        top_n = num_results or rag_config.slack_search_default_top_n
+
+        points = _query_slack_points(rag_config, query, rag_config.load_embeddings_model().embed_query(query),
+                                     channel_ids, top_n)
+        artifacts = _points_to_artifacts(points)
+        if rag_config.slack_search_reranked:
+            artifacts = get_reranker(rag_config).rerank(
+                query, artifacts, [str(point.id) for point in points], top_n)
+        return _format_artifacts(artifacts), artifacts
+
+    async def asearch_slack_conversation(query: str, channel_ids: Optional[List[str]] = None, num_results: Optional[int] = None, config: Annotated[RunnableConfig, InjectedToolArg] = None) -> Tuple[str, List[Artifact]]:
+        rag_config: RagConfig = RagConfig.from_runnable_config(config)
+        top_n = num_results or rag_config.slack_search_default_top_n
 
-        return content, reranked_artifacts
+        vector = await rag_config.load_embeddings_model().aembed_query(query)
+        # the qdrant client is sync and pooled, a worker thread keeps it off the event loop
+        points = await asyncio.to_thread(_query_slack_points, rag_config, query, vector, channel_ids, top_n)
+        artifacts = _points_to_artifacts(points)
+        if rag_config.slack_search_reranked:
+            artifacts = await get_reranker(rag_config).arerank(
+                query, artifacts, [str(point.id) for point in points], top_n)
+        return _format_artifacts(artifacts), artifacts
 
-    search_slack_conversation.description = config.get_prompt(
+    description = config.get_prompt(
         "search_slack_conversation_tool").text.strip()
-    search_slack_conversation.description += "\n\nChannels:\n"
-    search_slack_conversation.description += "\n".join([f"""
+    description += "\n\nChannels:\n"
+    description += "\n".join([f"""
 - name: {channel["name"]}
   id: {channel["id"]}
   id_from_slack: <#{channel["id"]}|>
   description: {channel["description"]}
 """.strip() for channel in RagConfig().slack_search_channels])
 
-    return search_slack_conversation
+    return StructuredTool.from_function(
+        func=search_slack_conversation,
+        coroutine=asearch_slack_conversation,
+        description=description,
+        response_format="content_and_artifact",
+    )
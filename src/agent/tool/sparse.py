@@ -0,0 +1,64 @@
+import re
+import hashlib
+from collections import Counter
+from typing import Callable, Iterator, List
+
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+DENSE_VECTOR_NAME = "dense"
+SPARSE_VECTOR_NAME = "sparse"
+
+# kana, cjk ideographs and hangul
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_PATTERN = re.compile(rf"[{_CJK}]+")
+# a run of cjk characters, or a word of any other script without underscores
+TOKEN_PATTERN = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """Lowercased words, with cjk runs cut into overlapping bigrams since they have no spaces between words."""
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if len(token) > 1 and CJK_PATTERN.match(token):
+            for i in range(len(token) - 1):
+                yield token[i:i + 2]
+        else:
+            yield token
+
+
+def _token_index(token: str) -> int:
+    # hash() is salted per process, the index of a token must be the same in the loader and the bot
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+
+
+class LexicalSparseEmbeddings(SparseEmbeddings):
+    """
+    BM25 style sparse vectors for qdrant, without a model.
+
+    Documents get the BM25 term frequency part of each token and queries a weight per token; the
+    collection's sparse vector uses the IDF modifier, so qdrant applies the inverse document frequency
+    from its own statistics at query time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_length: float = 512):
+        self.k1 = k1
+        self.b = b
+        self.avg_length = avg_length
+
+    def _to_vector(self, counts: Counter, weight: Callable[[int], float]) -> SparseVector:
+        values = {}
+        for token, count in counts.items():
+            index = _token_index(token)
+            values[index] = values.get(index, 0.0) + weight(count)
+        return SparseVector(indices=list(values), values=list(values.values()))
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        vectors = []
+        for text in texts:
+            counts = Counter(tokenize(text))
+            norm = self.k1 * (1 - self.b + self.b * sum(counts.values()) / self.avg_length)
+            vectors.append(self._to_vector(counts, lambda tf: tf * (self.k1 + 1) / (tf + norm)))
+        return vectors
+
+    def embed_query(self, text: str) -> SparseVector:
+        return self._to_vector(Counter(tokenize(text)), float)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -11,13 +11,18 @@ from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
 from langgraph.checkpoint.mongodb import MongoDBSaver
 
 from tracking import BaseTracker, StdoutTracker, LangfuseTracker, LangSmithTracker
-from .logger import LoggerMixin
+from store import BaseStore, MemoryStore, MongoDBStore, SessionStore, TitleStore
+from .logger import LoggerConfig, LoggerMixin
 from .model import ModelMixin
 from .prompt import PromptMixin
 from .message import EmojiMixin, MessageMixin
 
+_mongodb_client: Optional[AsyncMongoClient] = None
+_sync_mongodb_client: Optional[MongoClient] = None
 _checkpointer: Optional[Checkpointer] = None
 _tracker: Optional[BaseTracker] = None
+_stores: Dict[str, BaseStore] = {}
+_title_store: Optional[TitleStore] = None
 
 
 class CheckpointerProvider(Enum):
@@ -25,6 +30,11 @@ class CheckpointerProvider(Enum):
     MONGODB = "mongodb"
 
 
+class StoreProvider(Enum):
+    MEMORY = "memory"
+    MONGODB = "mongodb"
+
+
 class TrackingProvider(Enum):
     NONE = "none"
     STDOUT = "stdout"
@@ -55,11 +65,91 @@ class AgentConfig(BaseSettings, LoggerMixin, ModelMixin, PromptMixin, EmojiMixin
         description="Whether to use the async MongoDB checkpointer."
     )
 
+    graph_refresh_interval: float = Field(
+        default=300.0,
+        description="The number of seconds a compiled supervisor graph is reused before checking the model and prompts for changes."
+    )
+
+    store_provider: Optional[StoreProvider] = Field(
+        default=None,
+        description="The provider to use for the bot's shared state such as sessions. Defaults to the checkpointer provider; the MongoDB provider reuses the checkpointer's client."
+    )
+
+    store_mongodb_database: str = Field(
+        default="agentic_slack_bot",
+        description="The MongoDB database for the bot's shared state."
+    )
+
+    store_memory_max_size: int = Field(
+        default=10000,
+        description="The maximum number of entries per in-memory store before the least recently used ones are evicted."
+    )
+
+    session_ttl: float = Field(
+        default=7 * 24 * 60 * 60,
+        description="The number of seconds a slack channel or thread keeps its agent session after its last message."
+    )
+
+    title_cache_ttl: float = Field(
+        default=30 * 24 * 60 * 60,
+        description="The number of seconds a generated conversation title is reused for the same content."
+    )
+
+    title_fast: bool = Field(
+        default=True,
+        description="Whether tools label a conversation they have no cached title for with its first message line, generating the title in the background. The bot puts it in place of the first line in its reply once generated, and later calls reuse it."
+    )
+
+    crawler_cache_dir: Optional[str] = Field(
+        default=".cache/crawler",
+        description="The directory where crawled pages are cached with their converted markdown. Unset disables the cache."
+    )
+
+    crawler_cache_max_entries: int = Field(
+        default=10000,
+        description="The maximum number of crawled pages kept in the cache before the least recently written ones are removed."
+    )
+
+    crawler_extract_budget: int = Field(
+        default=8000,
+        description="The maximum number of characters of a crawled page returned to the agent when it gives a query; the passages most relevant to the query are kept. 0 returns whole pages."
+    )
+
+    crawler_passage_length: int = Field(
+        default=1000,
+        description="The approximate number of characters of the passages a crawled page is split into for extraction."
+    )
+
     tracking_provider: TrackingProvider = Field(
         default=TrackingProvider.NONE,
         description="The provider to use for tracking the agent's interactions."
     )
 
+    tracking_buffer_size: int = Field(
+        default=1000,
+        description="The maximum number of feedback records waiting to be exported before new ones are dropped."
+    )
+
+    tracking_batch_size: int = Field(
+        default=20,
+        description="The maximum number of feedback records exported to the tracking provider at once."
+    )
+
+    tracking_flush_interval: float = Field(
+        default=5.0,
+        description="The maximum number of seconds a feedback record waits for its batch to fill before it is exported."
+    )
+
+    tracking_max_tries: int = Field(
+        default=5,
+        description="The number of attempts to export a batch of feedback records before it is dropped."
+    )
+
+    tracking_flush_timeout: float = Field(
+        default=30.0,
+        description="The maximum number of seconds to wait for pending feedback records to be exported on shutdown."
+    )
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -69,6 +159,24 @@ class AgentConfig(BaseSettings, LoggerMixin, ModelMixin, PromptMixin, EmojiMixin
         configurable = config.get("configurable") or {}
         return cls(**{k: v for k, v in configurable.items() if k in cls.model_fields})
 
+    def get_mongodb_client(self) -> AsyncMongoClient:
+        global _mongodb_client
+        if _mongodb_client is None:
+            _mongodb_client = AsyncMongoClient(
+                self.checkpointer_mongodb_uri,
+                uuidRepresentation="standard"
+            )
+        return _mongodb_client
+
+    def get_sync_mongodb_client(self) -> MongoClient:
+        global _sync_mongodb_client
+        if _sync_mongodb_client is None:
+            _sync_mongodb_client = MongoClient(
+                self.checkpointer_mongodb_uri,
+                uuidRepresentation="standard"
+            )
+        return _sync_mongodb_client
+
     def get_checkpointer(self, async_mongodb: bool = True) -> Checkpointer:
         global _checkpointer
         if _checkpointer is None:
@@ -77,34 +185,67 @@ class AgentConfig(BaseSettings, LoggerMixin, ModelMixin, PromptMixin, EmojiMixin
                     _checkpointer = MemorySaver()
                 case CheckpointerProvider.MONGODB:
                     if async_mongodb:
-                        client = AsyncMongoClient(
-                            self.checkpointer_mongodb_uri,
-                            uuidRepresentation="standard"
-                        )
-                        _checkpointer = AsyncMongoDBSaver(client)
+                        _checkpointer = AsyncMongoDBSaver(
+                            self.get_mongodb_client())
                     else:
-                        client = MongoClient(
-                            self.checkpointer_mongodb_uri,
-                            uuidRepresentation="standard"
-                        )
-                        _checkpointer = MongoDBSaver(client)
+                        _checkpointer = MongoDBSaver(
+                            self.get_sync_mongodb_client())
                 case _:
                     raise ValueError(
                         f"Invalid checkpointer provider: {self.checkpointer_provider}")
         return _checkpointer
 
+    def get_store_provider(self) -> StoreProvider:
+        return self.store_provider or StoreProvider(self.checkpointer_provider.value)
+
+    def get_store(self, namespace: str, ttl: Optional[float] = None, sync: bool = False) -> BaseStore:
+        if namespace not in _stores:
+            match self.get_store_provider():
+                case StoreProvider.MEMORY:
+                    _stores[namespace] = MemoryStore(
+                        self.store_memory_max_size, ttl)
+                case StoreProvider.MONGODB:
+                    _stores[namespace] = MongoDBStore(
+                        self.get_mongodb_client(), self.store_mongodb_database, namespace, ttl,
+                        self.get_sync_mongodb_client() if sync else None)
+                case _:
+                    raise ValueError(
+                        f"Invalid store provider: {self.store_provider}")
+        return _stores[namespace]
+
+    def get_session_store(self) -> SessionStore:
+        return SessionStore(self.get_store("session", self.session_ttl))
+
+    def get_title_store(self) -> TitleStore:
+        global _title_store
+        if _title_store is None:
+            # make_title is called without an event loop by the MCP server and the RAG loader
+            _title_store = TitleStore(self.get_store(
+                "title", self.title_cache_ttl, sync=True), self.store_memory_max_size)
+        return _title_store
+
     def get_tracker(self) -> Optional[BaseTracker]:
         global _tracker
         if _tracker is None:
+            exporter_options = {
+                "buffer_size": self.tracking_buffer_size,
+                "batch_size": self.tracking_batch_size,
+                "flush_interval": self.tracking_flush_interval,
+                "max_tries": self.tracking_max_tries,
+                "flush_timeout": self.tracking_flush_timeout,
+            }
             match self.tracking_provider:
                 case TrackingProvider.NONE:
                     _tracker = None
                 case TrackingProvider.STDOUT:
-                    _tracker = StdoutTracker()
+                    _tracker = StdoutTracker(
+                        LoggerConfig(), **exporter_options)
                 case TrackingProvider.LANGSMITH:
-                    _tracker = LangSmithTracker(self._get_langsmith_config())
+                    _tracker = LangSmithTracker(
+                        self._get_langsmith_config(), **exporter_options)
                 case TrackingProvider.LANGFUSE:
-                    _tracker = LangfuseTracker(self._get_langfuse_config())
+                    _tracker = LangfuseTracker(
+                        self._get_langfuse_config(), **exporter_options)
                 case _:
                     raise ValueError(
                         f"Invalid tracking provider: {self.tracking_provider}")
@@ -1,5 +1,4 @@
 import os
-import httpx
 from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -9,9 +8,9 @@ from langfuse.callback import CallbackHandler
 from qdrant_client import QdrantClient
 
 from .logger import LoggerMixin
+from .http import HttpConfig
 
 
-_httpx_client: Optional[httpx.Client] = None
 _langfuse_client: Optional[Langfuse] = None
 _langfuse_callback_handler: Optional[CallbackHandler] = None
 
@@ -36,12 +35,6 @@ class LangfuseConfig(BaseSettings, LoggerMixin):
     def enabled(self) -> bool:
         return self.public_key is not None and self.secret_key is not None
 
-    def _get_httpx_client(self) -> httpx.Client:
-        global _httpx_client
-        if _httpx_client is None:
-            _httpx_client = httpx.Client(verify=not self.skip_ssl_verify)
-        return _httpx_client
-
     def get_langfuse_client(self) -> Langfuse:
         if not self.enabled:
             raise RuntimeError("Langfuse is not enabled")
@@ -54,7 +47,7 @@ class LangfuseConfig(BaseSettings, LoggerMixin):
                 secret_key=self.secret_key,
                 environment=self.environment,
                 release=self.release,
-                httpx_client=self._get_httpx_client(),
+                httpx_client=HttpConfig().get_httpx_client(verify=not self.skip_ssl_verify),
             )
             assert _langfuse_client.auth_check()
 
@@ -73,7 +66,7 @@ class LangfuseConfig(BaseSettings, LoggerMixin):
                 environment=self.environment,
                 release=self.release,
                 version=self.version,
-                httpx_client=self._get_httpx_client(),
+                httpx_client=HttpConfig().get_httpx_client(verify=not self.skip_ssl_verify),
             )
             assert _langfuse_callback_handler.auth_check()
 
@@ -139,11 +132,18 @@ class QdrantConfig(BaseSettings, LoggerMixin):
     def get_qdrant_client(self) -> QdrantClient:
         global _qdrant_client
         if _qdrant_client is None:
+            http_config = HttpConfig()
+            # qdrant builds its own httpx client, without keep-alive unless given limits
             _qdrant_client = QdrantClient(
                 host=self.host,
                 port=self.port,
                 https=self.https,
                 verify=not self.skip_ssl_verify,
-                api_key=self.api_key
+                api_key=self.api_key,
+                timeout=int(http_config.timeout),
+                limits=http_config.get_httpx_limits(),
+                http2=http_config.http2_enabled,
             )
+            http_config.register_httpx_client(
+                "qdrant", _qdrant_client._client.openapi_client.client._client)
         return _qdrant_client
@@ -0,0 +1,158 @@
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from .logger import LoggerMixin
+
+_httpx_clients: Dict[str, httpx.Client] = {}
+_aiohttp_session: Optional[aiohttp.ClientSession] = None
+_requests_adapter: Optional[HTTPAdapter] = None
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """requests has no session wide timeout, callers like markitdown would otherwise wait forever."""
+
+    def __init__(self, timeout: Tuple[float, float], **kwargs: Any):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class HttpConfig(BaseSettings, LoggerMixin):
+    """
+    The connection pools shared by every http client of the process.
+
+    Clients keep their connections alive between calls instead of opening one per call. httpx clients
+    speak HTTP/2 when the h2 package is installed; aiohttp and requests only speak HTTP/1.1, so they are
+    limited per host instead.
+    """
+    model_config = SettingsConfigDict(
+        env_prefix="HTTP_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
+    max_connections: int = Field(
+        default=100,
+        description="The maximum number of open connections of a pool."
+    )
+    max_connections_per_host: int = Field(
+        default=10,
+        description="The maximum number of open connections to a single host, for the aiohttp and requests pools."
+    )
+    keepalive_expiry: float = Field(
+        default=30.0,
+        description="The number of seconds an idle connection is kept open."
+    )
+    connect_timeout: float = Field(
+        default=5.0,
+        description="The number of seconds to wait for a connection."
+    )
+    timeout: float = Field(
+        default=30.0,
+        description="The number of seconds to wait for a response."
+    )
+    http2: bool = Field(
+        default=True,
+        description="Whether httpx clients negotiate HTTP/2, when the h2 package is installed."
+    )
+
+    @property
+    def http2_enabled(self) -> bool:
+        return self.http2 and importlib.util.find_spec("h2") is not None
+
+    def get_httpx_limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    def get_httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def get_httpx_client(self, verify: bool = True) -> httpx.Client:
+        name = "httpx" if verify else "httpx_unverified"
+        if name not in _httpx_clients:
+            _httpx_clients[name] = httpx.Client(verify=verify, http2=self.http2_enabled,
+                                                limits=self.get_httpx_limits(), timeout=self.get_httpx_timeout())
+        return _httpx_clients[name]
+
+    def register_httpx_client(self, name: str, client: httpx.Client) -> None:
+        """Report the pool of a client built by a library, such as qdrant's, in get_pool_stats."""
+        _httpx_clients[name] = client
+
+    def get_aiohttp_session(self) -> aiohttp.ClientSession:
+        """The session of the running event loop, for the slack web api. Close it with close_aiohttp_session."""
+        global _aiohttp_session
+        if _aiohttp_session is None or _aiohttp_session.closed:
+            _aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections_per_host,
+                                               keepalive_timeout=self.keepalive_expiry),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout))
+        return _aiohttp_session
+
+    async def close_aiohttp_session(self) -> None:
+        global _aiohttp_session
+        if _aiohttp_session is not None:
+            await _aiohttp_session.close()
+            _aiohttp_session = None
+
+    def create_requests_session(self) -> requests.Session:
+        """
+        Create a session drawing its connections from the shared pool.
+
+        requests sessions are not thread safe, so each caller gets its own with its own headers, while the
+        adapter holding the connections is shared.
+        """
+        global _requests_adapter
+        if _requests_adapter is None:
+            _requests_adapter = _TimeoutHTTPAdapter((self.connect_timeout, self.timeout), pool_connections=self.max_connections,
+                                                    pool_maxsize=self.max_connections_per_host, pool_block=True)
+        session = requests.Session()
+        session.mount("https://", _requests_adapter)
+        session.mount("http://", _requests_adapter)
+        return session
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Open, idle and waiting connections by pool, None where the library does not track it."""
+        stats = {}
+        for name, client in _httpx_clients.items():
+            pool = getattr(client._transport, "_pool", None)
+            connections = list(getattr(pool, "_connections", []))
+            stats[name] = {
+                "open": len(connections),
+                "idle": sum(1 for connection in connections if connection.is_idle()),
+                "waiting": sum(1 for request in list(getattr(pool, "_requests", [])) if request.connection is None),
+            }
+
+        if _aiohttp_session is not None and not _aiohttp_session.closed:
+            connector = _aiohttp_session.connector
+            idle = sum(len(connections) for connections in getattr(
+                connector, "_conns", {}).values())
+            stats["aiohttp"] = {
+                "open": idle + len(getattr(connector, "_acquired", ())),
+                "idle": idle,
+                "waiting": sum(len(waiters) for waiters in getattr(connector, "_waiters", {}).values()),
+            }
+
+        if _requests_adapter is not None:
+            container = _requests_adapter.poolmanager.pools
+            pools = [pool for key in container.keys()
+                     if (pool := container.get(key)) is not None]
+            stats["requests"] = {
+                # urllib3 counts the connections it opened, not the ones it closed since
+                "open": sum(pool.num_connections for pool in pools),
+                "idle": sum(1 for pool in pools for connection in list(pool.pool.queue) if connection is not None),
+                "waiting": None,
+            }
+
+        return stats
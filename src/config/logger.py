@@ -1,11 +1,57 @@
+import json
+import random
 import logging
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
 import structlog
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 _logger: Optional[logging.Logger] = None
 
+# lines at these levels are never sampled out
+_UNSAMPLED_LEVELS = {"warning", "warn", "error", "exception", "critical", "fatal"}
+
+
+class LazyJSON:
+    """
+    A log field serialized to json only when its line is emitted.
+
+    Lines below the log level are dropped before any processor runs, and sampled out lines before the
+    payloads are rendered, so passing LazyJSON(body) instead of json.dumps(body) costs nothing for them.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def render(self, max_length: int) -> str:
+        if isinstance(self.value, BaseModel):
+            text = self.value.model_dump_json()
+        else:
+            text = json.dumps(self.value, ensure_ascii=False, default=str)
+        if 0 < max_length < len(text):
+            return f"{text[:max_length]}...({len(text)} chars)"
+        return text
+
+
+def _sample_log_events(rates: Dict[str, float]) -> Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]:
+    def sample_log_events(_: Any, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        rate = rates.get(event_dict.get("event"))
+        if rate is not None and method_name not in _UNSAMPLED_LEVELS and random.random() >= rate:
+            raise structlog.DropEvent
+        return event_dict
+    return sample_log_events
+
+
+def _render_lazy_payloads(max_length: int) -> Callable[[Any, str, Dict[str, Any]], Dict[str, Any]]:
+    def render_lazy_payloads(_: Any, __: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        for key, value in event_dict.items():
+            if isinstance(value, LazyJSON):
+                event_dict[key] = value.render(max_length)
+        return event_dict
+    return render_lazy_payloads
+
 
 class LoggerConfig(BaseSettings):
     model_config = SettingsConfigDict(
@@ -17,12 +63,28 @@ class LoggerConfig(BaseSettings):
 
     level: str = "INFO"
 
+    payload_max_length: int = Field(
+        default=10000,
+        description="The maximum number of characters of a json payload in a log line, e.g. a slack body or response. 0 disables the cap."
+    )
+
+    sample_rates: Dict[str, float] = Field(
+        default={},
+        description="The fraction of lines kept by log event, e.g. {\"got slack message event\": 0.1}. Warnings and errors are always kept."
+    )
+
     @property
     def logger(self) -> logging.Logger:
         global _logger
         if _logger is None:
-            structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(
-                getattr(logging, self.level.upper())))
+            structlog.configure(
+                wrapper_class=structlog.make_filtering_bound_logger(
+                    getattr(logging, self.level.upper())),
+                processors=[
+                    _sample_log_events(self.sample_rates),
+                    _render_lazy_payloads(self.payload_max_length),
+                    *structlog.get_config()["processors"],
+                ])
             _logger = structlog.stdlib.get_logger()
         return _logger
 
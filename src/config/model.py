@@ -1,11 +1,114 @@
-from typing import Annotated
+import json
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Annotated, Dict, List, Optional
 
 from pydantic import Field
 from langchain_core.language_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
 from langchain.chat_models import init_chat_model
+from langchain.storage import LocalFileStore
 from langchain_google_vertexai import VertexAIEmbeddings
 
+_embeddings: Dict[str, "CachedEmbeddings"] = {}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings with query vectors cached in an in-process LRU, backed by an optional persistent store.
+
+    Queries are keyed by model and whitespace-normalized text, so the same question from the bot, the MCP
+    server and streamlit is embedded once. Document vectors are embedded with a different task type and
+    are passed through uncached.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, max_size: int, store: Optional[ByteStore] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_size = max_size
+        self.store = store
+        self._vectors: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._store_hits = 0
+        self._misses = 0
+
+    def _get_key(self, text: str) -> str:
+        text = " ".join(unicodedata.normalize("NFKC", text).split())
+        return hashlib.sha256(f"{self.model}\n{text}".encode()).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if (vector := self._vectors.get(key)) is not None:
+                self._vectors.move_to_end(key)
+                self._hits += 1
+            return vector
+
+    def _get_stored(self, key: str) -> Optional[List[float]]:
+        if self.store is not None and (value := self.store.mget([key])[0]) is not None:
+            vector = json.loads(value)
+            self._set_local(key, vector)
+            with self._lock:
+                self._store_hits += 1
+            return vector
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def _set_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+
+    def _set_stored(self, key: str, vector: List[float]) -> None:
+        if self.store is not None:
+            self.store.mset([(key, json.dumps(vector).encode())])
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._get_key(text)
+        if (vector := self._get_local(key)) is None and (vector := self._get_stored(key)) is None:
+            vector = self.embeddings.embed_query(text)
+            self._set_local(key, vector)
+            self._set_stored(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._get_key(text)
+        if (vector := self._get_local(key)) is not None:
+            return vector
+        # the store reads and writes files, keep them off the event loop
+        if self.store is None:
+            vector = self._get_stored(key)
+        else:
+            vector = await asyncio.to_thread(self._get_stored, key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self._set_local(key, vector)
+            if self.store is not None:
+                await asyncio.to_thread(self._set_stored, key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "store_hits": self._store_hits,
+                "misses": self._misses,
+                "size": len(self._vectors),
+            }
+
 
 class ModelMixin:
     model: Annotated[str, {"__template_metadata__": {"kind": "llm"}}] = Field(
@@ -20,6 +123,16 @@ class ModelMixin:
         "Should be in the form: provider/model-name."
     )
 
+    embeddings_cache_size: int = Field(
+        default=1024,
+        description="The number of query embeddings kept in memory."
+    )
+
+    embeddings_cache_path: Optional[str] = Field(
+        default=None,
+        description="The directory where query embeddings are persisted across processes and restarts. Unset keeps them in memory only."
+    )
+
     rerank_model: str = Field(
         default="semantic-ranker-default-004",
         description="The name of the rerank model to use for the rag reranking."
@@ -29,9 +142,21 @@ class ModelMixin:
         provider, model = self.model.split("/", maxsplit=1)
         return init_chat_model(model, model_provider=provider, **kwargs)
 
-    def load_embeddings_model(self) -> Embeddings:
-        provider, model = self.embeddings_model.split("/", maxsplit=1)
-        if provider == "google_vertexai":
-            return VertexAIEmbeddings(model)
-        raise ValueError(
-            f"Invalid embeddings model provider: {provider}")
+    def load_embeddings_model(self) -> CachedEmbeddings:
+        """The embeddings client of the model, shared by every caller of the process."""
+        if self.embeddings_model not in _embeddings:
+            provider, model = self.embeddings_model.split("/", maxsplit=1)
+            if provider == "google_vertexai":
+                embeddings = VertexAIEmbeddings(model)
+            else:
+                raise ValueError(
+                    f"Invalid embeddings model provider: {provider}")
+            store = LocalFileStore(
+                self.embeddings_cache_path) if self.embeddings_cache_path else None
+            _embeddings[self.embeddings_model] = CachedEmbeddings(
+                embeddings, self.embeddings_model, self.embeddings_cache_size, store)
+        return _embeddings[self.embeddings_model]
+
+    def get_embeddings_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hits and misses of the query embeddings cache by model, for the models loaded so far."""
+        return {model: embeddings.stats() for model, embeddings in _embeddings.items()}
@@ -1,15 +1,20 @@
-from typing import Optional, List, TypedDict
+import threading
+from typing import Dict, Optional, List, Tuple, TypedDict
 
 from pydantic import Field
 from pydantic_settings import SettingsConfigDict
 from pydantic_settings_yaml import YamlBaseSettings
 from langchain_core.runnables import RunnableConfig, ensure_config
+from langchain_google_community import GoogleSearchAPIWrapper
 
 from .logger import LoggerMixin
 from .model import ModelMixin
 from .prompt import PromptMixin
 from .client import QdrantConfig
 
+# the search api client keeps its connection alive but is not thread safe, so each tool thread reuses its own
+_google_search_apis = threading.local()
+
 
 class SlackSearchChannel(TypedDict):
     id: str
@@ -49,11 +54,28 @@ class RagConfig(YamlBaseSettings, LoggerMixin, ModelMixin, PromptMixin):
         default=0.6,
         description="The score threshold for the search results."
     )
+    slack_search_hybrid: bool = Field(
+        default=False,
+        description="Whether chunks are indexed with a named dense and a sparse lexical vector, and searches fuse both. Turning it on needs a collection loaded again by the slack loader, existing collections only have the unnamed dense vector."
+    )
+    slack_search_rerank: Optional[bool] = Field(
+        default=None,
+        description="Whether search results are reranked by the rerank model, can be set per call in the runnable config. Defaults to reranking dense searches only."
+    )
     slack_search_rerank_top_n_multiplier: float = Field(
         default=5.0,
         description="The multiplier for the number of search results to fetch before reranking. For example, if num_results=10 and multiplier=3, we'll fetch 30 results then rerank to get the top 10."
     )
 
+    rerank_timeout: float = Field(
+        default=3.0,
+        description="The number of seconds to wait for the rerank api before keeping the vector search order."
+    )
+    rerank_cache_size: int = Field(
+        default=4096,
+        description="The number of (query, document) rerank scores kept in memory."
+    )
+
     vector_size: int = Field(
         default=3072,
         description="The size of the vector to use for the RAG."
@@ -81,7 +103,19 @@ class RagConfig(YamlBaseSettings, LoggerMixin, ModelMixin, PromptMixin):
         configurable = config.get("configurable") or {}
         return cls(**{k: v for k, v in configurable.items() if k in cls.model_fields})
 
+    @property
+    def slack_search_reranked(self) -> bool:
+        return self.slack_search_rerank if self.slack_search_rerank is not None else not self.slack_search_hybrid
+
     def get_qdrant_config(self) -> QdrantConfig:
         if self._qdrant_config is None:
             self._qdrant_config = QdrantConfig()
         return self._qdrant_config
+
+    def get_google_search_api(self) -> GoogleSearchAPIWrapper:
+        apis: Dict[Tuple[str, str], GoogleSearchAPIWrapper] = _google_search_apis.__dict__.setdefault("apis", {})
+        key = (self.google_api_key, self.google_cse_id)
+        if key not in apis:
+            apis[key] = GoogleSearchAPIWrapper(
+                google_api_key=self.google_api_key, google_cse_id=self.google_cse_id)
+        return apis[key]
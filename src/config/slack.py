@@ -1,9 +1,17 @@
+from typing import Dict, Optional
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from slack_bot.ratelimit import SlackRateLimiter
+from slack_bot.cache import ConversationCache
 from .logger import LoggerMixin
 from .prompt import PromptMixin
 from .message import EmojiMixin, MessageMixin
 
+_rate_limiter: Optional[SlackRateLimiter] = None
+_conversation_cache: Optional[ConversationCache] = None
+
 
 class SlackConfig(BaseSettings, LoggerMixin, PromptMixin, EmojiMixin, MessageMixin):
     model_config = SettingsConfigDict(
@@ -18,3 +26,102 @@ class SlackConfig(BaseSettings, LoggerMixin, PromptMixin, EmojiMixin, MessageMix
     bot_id: str
     assistant: bool = False
     workspace_url: str
+
+    processes: int = Field(
+        default=1,
+        description="The number of bot processes, each with its own Socket Mode connection. Above 1, sessions, dedupe and the reply index must live in a shared store."
+    )
+
+    event_workers: int = Field(
+        default=4,
+        description="The number of workers processing app mentions and messages concurrently. Events of the same channel or thread are always processed in order."
+    )
+    event_assistant_workers: int = Field(
+        default=4,
+        description="The number of workers processing assistant messages concurrently, in their own lane."
+    )
+    event_feedback_workers: int = Field(
+        default=1,
+        description="The number of workers processing reaction feedback events, in their own lane."
+    )
+    event_queue_max_size: int = Field(
+        default=100,
+        description="The maximum number of events waiting in each lane. Further events are shed with a busy reply."
+    )
+    event_drain_timeout: float = Field(
+        default=60.0,
+        description="The number of seconds to wait for in-flight events to finish on shutdown."
+    )
+
+    speculative_agent_run: bool = Field(
+        default=False,
+        description="Whether to start the agent on direct messages while the new conversation check is still running, discarding the run if the check says yes."
+    )
+
+    stream_reply: bool = Field(
+        default=False,
+        description="Whether to stream agent answers into slack by progressively updating the reply message."
+    )
+    stream_update_interval: float = Field(
+        default=1.5,
+        description="The minimum number of seconds between two chat.update calls of a streaming reply. Keep it above 1.2 to stay within the chat.update tier 3 limit."
+    )
+
+    event_dedupe_ttl: float = Field(
+        default=60 * 60,
+        description="The number of seconds a received event is remembered to skip slack's redeliveries of it."
+    )
+
+    rate_limits: Dict[str, float] = Field(
+        default={},
+        description="Requests per minute by web api method, overriding the rate limit tier defaults, e.g. {\"conversations.history\": 1} for apps limited to one history call a minute."
+    )
+
+    rate_limit_burst: float = Field(
+        default=3,
+        description="The number of calls of a web api method allowed in a burst before calls are spread at the method's rate."
+    )
+
+    rate_limit_max_retries: int = Field(
+        default=5,
+        description="The number of attempts of a web api call rate limited by slack, each after waiting for its Retry-After."
+    )
+
+    reply_max_length: int = Field(
+        default=10000,
+        description="The maximum number of characters of a reply message. Longer answers are split into consecutive messages between paragraphs, lists and code blocks. Slack renders at most 12000 characters of markdown per message."
+    )
+
+    reply_index_ttl: float = Field(
+        default=30 * 24 * 60 * 60,
+        description="The number of seconds the bot remembers its replies for collecting reaction feedback without fetching them from slack."
+    )
+
+    conversation_cache_size: int = Field(
+        default=256,
+        description="The number of threads and channel histories kept in memory, least recently used first out. 0 disables the cache."
+    )
+    conversation_cache_ttl: float = Field(
+        default=30.0,
+        description="The number of seconds a cached conversation is served without asking slack for newer messages."
+    )
+    conversation_cache_max_messages: int = Field(
+        default=1000,
+        description="The maximum number of messages of a cached conversation, longer ones are always fetched from slack."
+    )
+
+    def get_rate_limiter(self) -> SlackRateLimiter:
+        global _rate_limiter
+        if _rate_limiter is None:
+            _rate_limiter = SlackRateLimiter(
+                self.get_logger(), self.rate_limits, self.rate_limit_burst, self.rate_limit_max_retries, self.processes)
+        return _rate_limiter
+
+    def get_conversation_cache(self) -> ConversationCache:
+        global _conversation_cache
+        if _conversation_cache is None:
+            # with several processes each one receives only some of the events
+            _conversation_cache = ConversationCache(
+                self.conversation_cache_size, self.conversation_cache_ttl, self.conversation_cache_max_messages,
+                sees_all_events=self.processes == 1)
+        return _conversation_cache
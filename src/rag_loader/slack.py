@@ -1,14 +1,16 @@
+import sys
+import argparse
 from datetime import datetime, timezone
 from uuid import uuid4
 from qdrant_client import models
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_qdrant import QdrantVectorStore
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
 from langchain_core.documents import Document
 
-from config import SlackConfig, RagConfig
-from agent.chain import create_make_title_chain
-from agent.tool import clean_title
-from slack_bot.client import SlackClient
+from config import SlackConfig, RagConfig, AgentConfig
+from agent.title import make_title
+from agent.tool.sparse import DENSE_VECTOR_NAME, SPARSE_VECTOR_NAME, LexicalSparseEmbeddings
+from slack_bot.client import SlackClient, SlackPaginationError
 from slack_bot.types import message_to_text
 
 
@@ -19,15 +21,32 @@ logger.debug("config loaded", rag_config=rag_config, slack_config=slack_config)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="rag-slack-loader")
+    parser.add_argument("--cursor", action="append", default=[], metavar="CHANNEL_ID=CURSOR",
+                        help="continue loading a channel's history from a cursor logged by an earlier run")
+    args = parser.parse_args()
+    cursors = dict(cursor.split("=", 1) for cursor in args.cursor)
+    failed_channels = []
+
     qdrant_client = rag_config.get_qdrant_config().get_qdrant_client()
 
     if not qdrant_client.collection_exists(rag_config.slack_search_collection_name):
         logger.info("Creating collection...")
-        qdrant_client.create_collection(
-            collection_name=rag_config.slack_search_collection_name,
-            vectors_config=models.VectorParams(
-                size=rag_config.vector_size, distance=models.Distance.COSINE),
-        )
+        dense_vector_params = models.VectorParams(
+            size=rag_config.vector_size, distance=models.Distance.COSINE)
+        if rag_config.slack_search_hybrid:
+            # qdrant weighs the lexical vectors by inverse document frequency from its own statistics
+            qdrant_client.create_collection(
+                collection_name=rag_config.slack_search_collection_name,
+                vectors_config={DENSE_VECTOR_NAME: dense_vector_params},
+                sparse_vectors_config={SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                    modifier=models.Modifier.IDF)},
+            )
+        else:
+            qdrant_client.create_collection(
+                collection_name=rag_config.slack_search_collection_name,
+                vectors_config=dense_vector_params,
+            )
         qdrant_client.create_payload_index(
             collection_name=rag_config.slack_search_collection_name,
             field_name="metadata.source",
@@ -39,20 +58,30 @@ if __name__ == "__main__":
             field_schema="keyword"
         )
 
-    vector_store = QdrantVectorStore(
-        client=qdrant_client,
-        collection_name=rag_config.slack_search_collection_name,
-        embedding=rag_config.load_embeddings_model(),
-    )
+    if rag_config.slack_search_hybrid:
+        vector_store = QdrantVectorStore(
+            client=qdrant_client,
+            collection_name=rag_config.slack_search_collection_name,
+            embedding=rag_config.load_embeddings_model(),
+            retrieval_mode=RetrievalMode.HYBRID,
+            vector_name=DENSE_VECTOR_NAME,
+            sparse_embedding=LexicalSparseEmbeddings(),
+            sparse_vector_name=SPARSE_VECTOR_NAME,
+        )
+    else:
+        vector_store = QdrantVectorStore(
+            client=qdrant_client,
+            collection_name=rag_config.slack_search_collection_name,
+            embedding=rag_config.load_embeddings_model(),
+        )
 
     slack_client = SlackClient(slack_config, logger=logger)
+    title_store = AgentConfig().get_title_store()
 
     for channel in rag_config.slack_search_channels:
-        history = slack_client.fetch_conversations_history(
-            channel["id"], channel["retrieve_limit"], 15)
-
-        for page in history["pages"]:
-            for message in page["messages"]:
+        try:
+            for message in slack_client.iter_conversations_history(
+                    channel["id"], max_pages=channel["retrieve_limit"], size=15, cursor=cursors.get(channel["id"])):
                 try:
                     if message_to_text(message) is None:
                         continue
@@ -100,15 +129,20 @@ if __name__ == "__main__":
                     logger.exception("KeyError", error=e, message=message)
                     continue
 
-                for message in slack_client.fetch_conversations_replies(channel["id"], message["ts"]):
-                    if (text := message_to_text(message)) is None:
-                        continue
-                    doc.page_content += f"\n\n---\n\n{text}"
+                try:
+                    for message in slack_client.iter_conversations_replies(channel["id"], message["ts"], size=15, cache=False):
+                        if (text := message_to_text(message)) is None:
+                            continue
+                        doc.page_content += f"\n\n---\n\n{text}"
+                except SlackPaginationError:
+                    logger.exception("failed to fetch thread replies, skipping thread",
+                                     metadata=doc.metadata)
+                    failed_channels.append(channel["id"])
+                    continue
                 doc.page_content = doc.page_content.strip().removeprefix("---\n\n")
 
-                title = create_make_title_chain(rag_config).invoke(
-                    input={"input": doc.page_content})
-                doc.metadata["title"] = clean_title(title)
+                doc.metadata["title"] = make_title(
+                    rag_config, title_store, doc.page_content)
 
                 logger.info("Splitting document", metadata=doc.metadata)
 
@@ -147,3 +181,17 @@ if __name__ == "__main__":
                     batch = chunks[i: i + rag_config.batch_size]
                     vector_store.add_documents(
                         documents=batch, ids=[str(uuid4()) for _ in batch])
+        except SlackPaginationError as e:
+            if e.cursor is not None:
+                # the messages before the failed page are loaded, the rest can be resumed from it
+                logger.exception("failed to fetch channel history",
+                                 channel_id=channel["id"], resume=f"--cursor {channel['id']}={e.cursor}")
+            else:
+                logger.exception("failed to fetch channel history, rerun the channel from the start",
+                                 channel_id=channel["id"])
+            failed_channels.append(channel["id"])
+
+    if failed_channels:
+        logger.error("some channels were loaded partially",
+                     channel_ids=sorted(set(failed_channels)))
+        sys.exit(1)
@@ -1,9 +1,11 @@
 import asyncio
 import signal
-
+import argparse
+from typing import Optional
 
 from config import SlackConfig, AgentConfig
 from .bot import SlackBot
+from .process import WorkerSupervisor
 
 
 slack_config = SlackConfig()
@@ -18,19 +20,35 @@ def graceful_shutdown(sig: signal.Signals, task_to_cancel: set[asyncio.Task]) ->
     for task in task_to_cancel:
         logger.info("cancelling task", task=task)
         task.cancel()
+    # a second signal (e.g. ctrl-c reaching both the supervisor and the workers) must not interrupt the drain
+    task_to_cancel.clear()
+
 
+async def main(worker: Optional[int] = None, workers: Optional[int] = None) -> None:
+    if workers is not None:
+        # --workers overrides SLACK_PROCESSES, the rate limits and the conversation cache depend on it
+        slack_config.processes = workers
 
-async def main() -> None:
     loop = asyncio.get_running_loop()
     task_to_cancel = {asyncio.current_task()}
     for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(sig, graceful_shutdown, sig, task_to_cancel)
 
-    async with SlackBot(slack_config, agent_config, logger) as bot:
+    async with SlackBot(slack_config, agent_config, logger if worker is None else logger.bind(worker=worker)) as bot:
         try:
             await bot.run()
         except asyncio.exceptions.CancelledError:
             logger.info("slack handler cancelled")
 
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(prog="slack-bot")
+    parser.add_argument("--workers", type=int, default=slack_config.processes,
+                        help="number of bot processes, each with its own socket mode connection")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        WorkerSupervisor(args.workers, slack_config,
+                         agent_config, logger).run()
+    else:
+        asyncio.run(main(workers=args.workers))
@@ -0,0 +1,64 @@
+import re
+import time
+import argparse
+from typing import Callable, List
+
+from .markdown import DEFAULT_MAX_LENGTH, render_markdown, to_mrkdwn
+
+SECTION = """## Section {i}
+
+Some **bold** text, some *italic* text, a [link](https://example.com/{i}) and `inline code` in a paragraph
+that goes on for a while to look like an answer of the agent, with **more bold** and *more italic*.
+
+- first item with **bold**
+- second item with a [link](https://example.com/item/{i})
+  * nested item
+
+```python
+def section_{i}(x):
+    return x * 2  # **not bold**
+```
+
+"""
+
+
+def legacy_clean_markdown(text: str) -> str:
+    """The sequential substitutions to_mrkdwn replaced, kept as the baseline."""
+    text = re.sub(r"^```[^\n]*\n", "```\n", text, flags=re.MULTILINE)
+    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r"<\2|\1>", text)
+    text = re.sub(r"\*\*([^*]+)\*\*", r"*\1*", text)
+    text = re.sub(r"(?<!\*)\*([^*]+)\*(?!\*)", r"_\1_", text)
+    text = re.sub(r"_([^_]+)_", r"_\1_", text)
+    text = re.sub(r"^\s*[-*]\s", "• ", text, flags=re.MULTILINE)
+    return text
+
+
+def bench(name: str, func: Callable[[str], object], markdown: str, rounds: int) -> None:
+    timings: List[float] = []
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        func(markdown)
+        timings.append(time.perf_counter() - started_at)
+    timings.sort()
+    print(f"{name:<28} min {timings[0] * 1000:8.3f} ms  median {timings[len(timings) // 2] * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="slack-markdown-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="answer sizes in characters")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_LENGTH)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        sections = []
+        while sum(len(section) for section in sections) < size:
+            sections.append(SECTION.format(i=len(sections)))
+        markdown = "".join(sections)[:size]
+        print(f"answer of {len(markdown)} characters, "
+              f"{len(render_markdown(markdown, args.max_length))} messages of at most {args.max_length}")
+        bench("legacy_clean_markdown", legacy_clean_markdown, markdown, args.rounds)
+        bench("to_mrkdwn", to_mrkdwn, markdown, args.rounds)
+        bench("render_markdown", lambda text: render_markdown(
+            text, args.max_length), markdown, args.rounds)
@@ -1,9 +1,9 @@
-import json
+import time
 import random
 import asyncio
 import datetime
 import logging
-from typing import Dict, Any, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional
 
 from slack_bolt.app.async_app import AsyncApp, AsyncAssistant
 from slack_bolt.context.ack.async_ack import AsyncAck
@@ -11,15 +11,24 @@ from slack_bolt.context.say.async_say import AsyncSay
 from slack_bolt.context.set_suggested_prompts.async_set_suggested_prompts import AsyncSetSuggestedPrompts
 from slack_bolt.context.set_status.async_set_status import AsyncSetStatus
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, RemoveMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StateSnapshot
 
 from config import SlackConfig, AgentConfig
-from agent.supervisor import create_supervisor_graph
-from agent.parser import parse_agent_result
+from config.logger import LazyJSON
+from config.http import HttpConfig
+from agent.supervisor import SUPERVISOR_NAME, get_supervisor_graph
+from agent.parser import Reference, parse_agent_result
+from agent.title import wait_for_title
 from agent.chain import create_check_new_conversation_chain
 from .client import SlackAsyncClient
 from .types import SlackEvent, SlackEventType, message_to_text
+from .worker import EventWorkerPool, EventLane
+from .stream import SlackStreamingReply
+from .effects import SlackSideEffects
 
 
 class SlackBot:
@@ -27,11 +36,33 @@ class SlackBot:
         self.logger = logger or slack_config.get_logger()
         self.config = slack_config
         self.agent_config = agent_config
+        self.http_config = HttpConfig()
         self.app = AsyncApp(token=self.config.bot_token)
+        # without a session the client opens a new aiohttp session, and so a new connection, for every web api call
+        self.app.client.session = self.http_config.get_aiohttp_session()
         self.client = SlackAsyncClient(self.config, self.app.client, logger)
+        # reactions and statuses never hold up an ack or a reply
+        self.effects = SlackSideEffects(self.client, logger)
         self.handler = AsyncSocketModeHandler(self.app, self.config.app_token)
-        self.event_queue = asyncio.Queue()
+        lanes = {
+            EventLane.FEEDBACK: (self.config.event_feedback_workers, self.config.event_queue_max_size),
+            EventLane.DEFAULT: (self.config.event_workers, self.config.event_queue_max_size),
+        }
+        if self.config.assistant:
+            lanes[EventLane.ASSISTANT] = (
+                self.config.event_assistant_workers, self.config.event_queue_max_size)
+        self.event_pool = EventWorkerPool(
+            self._process_event, lanes, self.logger)
         self.tracker = self.agent_config.get_tracker()
+        self.session_store = self.agent_config.get_session_store()
+        self.reply_index = self.agent_config.get_store(
+            "reply_index", self.config.reply_index_ttl)
+        self.dedupe_store = self.agent_config.get_store(
+            "dedupe", self.config.event_dedupe_ttl)
+        self.speculation_stats = {"runs": 0, "wasted": 0}
+
+        # keep the cached conversations in sync with every message the bot sees
+        self.app.use(self._observe_conversation)
 
         if self.config.assistant:
             self.assistant = AsyncAssistant()
@@ -50,47 +81,111 @@ class SlackBot:
         await self.handler.start_async()
 
     async def __aenter__(self) -> "SlackBot":
-        async def event_worker(queue: asyncio.Queue):
-            self.logger.info("event worker started")
-            while True:
-                try:
-                    event: SlackEvent = await queue.get()
-                    if not event:
-                        self.logger.info(
-                            "all event processing tasks completed")
-                        break
-                    self.logger.info("processing event",
-                                     data=event.model_dump_json())
-                    match event.type:
-                        case SlackEventType.APP_MENTION:
-                            await self._process_app_mention_event(event)
-                        case SlackEventType.REACTION_ADDED:
-                            await self._process_reaction_added_event(event)
-                        case SlackEventType.MESSAGE:
-                            await self._process_message_event(event)
-                        case _:
-                            self.logger.warning("unknown event type",
-                                                data=event.model_dump_json())
-                except Exception as e:
-                    self.logger.exception(f"error in worker: {e}")
-                finally:
-                    queue.task_done()
-
-        asyncio.create_task(event_worker(self.event_queue))
-
+        # compile the supervisor graph before accepting events
+        get_supervisor_graph(self.agent_config, self.config)
+        self.event_pool.start()
         return self
 
     async def __aexit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        # events and their side effects share event_drain_timeout, which the supervisor waits for
+        deadline = time.monotonic() + self.config.event_drain_timeout
         await self.handler.close_async()
-        await self.event_queue.put(None)
-        self.logger.info("worker received sentinel and exiting")
-        await self.event_queue.join()
+        self.logger.info("waiting for in-flight events",
+                         timeout=self.config.event_drain_timeout)
+        await self.event_pool.drain(max(deadline - time.monotonic(), 0.0))
+        await self.effects.drain(max(deadline - time.monotonic(), 0.0))
+        if self.config.speculative_agent_run:
+            self.logger.info("speculative agent run stats",
+                             **self.speculation_stats)
+        self.logger.info("slack api rate limit stats",
+                         stats=self.client.rate_limiter.stats())
+        self.logger.info("slack conversation cache stats",
+                         stats=self.client.conversation_cache.stats())
+        self.logger.info("query embeddings cache stats",
+                         stats=self.agent_config.get_embeddings_cache_stats())
         if self.tracker is not None:
             self.tracker.flush()
+        self.logger.info("http connection pool stats",
+                         stats=self.http_config.get_pool_stats())
+        await self.http_config.close_aiohttp_session()
+
+    def _get_event_key(self, event: SlackEvent) -> str:
+        match event.type:
+            case SlackEventType.REACTION_ADDED:
+                return f"{event.channel}-{event.data['item']['ts']}"
+            case SlackEventType.MESSAGE:
+                return self.client.get_session_key(event, in_replies=self.config.assistant)
+            case _:
+                return self.client.get_session_key(event, in_replies=True)
+
+    def _get_event_lane(self, event: SlackEvent) -> EventLane:
+        match event.type:
+            case SlackEventType.REACTION_ADDED:
+                return EventLane.FEEDBACK
+            case SlackEventType.MESSAGE if self.config.assistant:
+                return EventLane.ASSISTANT
+            case _:
+                return EventLane.DEFAULT
+
+    async def _enqueue_event(self, event: SlackEvent) -> bool:
+        if self.event_pool.put(self._get_event_key(event), event, self._get_event_lane(event)):
+            return True
+        if event.type != SlackEventType.REACTION_ADDED:
+            await self._reply_busy(event)
+        return False
+
+    async def _is_duplicate_event(self, body: Dict[str, Any]) -> bool:
+        # slack redelivers events acked late, under the same client_msg_id but possibly a new event_id. The
+        # message and app_mention events of one post are handled separately, so the event type is part of the key
+        msg_id = body["event"].get("client_msg_id") or body.get("event_id")
+        if msg_id is None:
+            return False
+        key = f"{body['event'].get('type')}:{msg_id}"
+        _, created = await self.dedupe_store.set_if_absent(key, body.get("event_id"))
+        if not created:
+            self.logger.info("duplicate event, skipping",
+                             key=key, event_id=body.get("event_id"))
+        return not created
+
+    async def _reply_busy(self, event: SlackEvent) -> None:
+        in_assistant_thread = event.type == SlackEventType.MESSAGE and self.config.assistant
+        if not in_assistant_thread:
+            self.effects.add_reaction(event, self.config.get_emoji("ai_busy"))
+        await self.client.reply_blocks(event, self.config.get_message("ai_busy_message"), [
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "plain_text",
+                        "text": self.config.get_message("ai_busy_message"),
+                        "emoji": True
+                    }
+                ]
+            },
+        ], in_replies=in_assistant_thread or event.type == SlackEventType.APP_MENTION)
+
+    async def _process_event(self, event: SlackEvent) -> None:
+        self.logger.info("processing event",
+                         data=LazyJSON(event))
+        match event.type:
+            case SlackEventType.APP_MENTION:
+                await self._process_app_mention_event(event)
+            case SlackEventType.REACTION_ADDED:
+                await self._process_reaction_added_event(event)
+            case SlackEventType.MESSAGE:
+                await self._process_message_event(event)
+            case _:
+                self.logger.warning("unknown event type",
+                                    data=LazyJSON(event))
+
+    async def _observe_conversation(self, body: Dict[str, Any], next_: Callable[[], Awaitable[None]]) -> None:
+        if body.get("type") == "event_callback":
+            self.client.conversation_cache.observe(body["event"])
+        await next_()
 
     async def _error_handler(self, body: Dict[str, Any]) -> None:
         self.logger.exception("catched exception",
-                              slack_body=json.dumps(body, ensure_ascii=False))
+                              slack_body=LazyJSON(body))
 
     async def _handle_thread_started(self, say: AsyncSay, set_suggested_prompts: AsyncSetSuggestedPrompts):
         await say(self.config.get_message("assistant_greeting"))
@@ -99,43 +194,47 @@ class SlackBot:
         await set_suggested_prompts(prompts=[{"title": prompt["title"], "message": prompt["message"]} for prompt in prompts[:4]])
 
     async def _handle_assistant_message(self, body: Dict[str, Any], set_status: AsyncSetStatus, ack: AsyncAck) -> None:
+        await ack()
         self.logger.info("got slack assistant message event",
-                         slack_body=json.dumps(body, ensure_ascii=False))
-        if "subtype" not in body["event"] and body["event"]["text"].strip() != "":
+                         slack_body=LazyJSON(body))
+        if "subtype" not in body["event"] and body["event"]["text"].strip() != "" and not await self._is_duplicate_event(body):
             event = SlackEvent(type=SlackEventType.MESSAGE, data=body["event"], user=body["event"]
                                ["user"], channel=body["event"]["channel"], message_id=body["event"]["client_msg_id"])
-            await self.event_queue.put(event)
-            await set_status(self.config.get_message("assistant_thinking"))
-        await ack()
+            if await self._enqueue_event(event):
+                self.effects.set_status(event, self.config.get_message("assistant_thinking"), set_status)
 
     async def _handle_message(self, body: Dict[str, Any], ack: AsyncAck) -> None:
+        await ack()
         self.logger.info("got slack message event",
-                         slack_body=json.dumps(body, ensure_ascii=False))
-        if "subtype" not in body["event"] and body["event"]["text"].strip() != "":
+                         slack_body=LazyJSON(body))
+        if "subtype" not in body["event"] and body["event"]["text"].strip() != "" and not await self._is_duplicate_event(body):
             event = SlackEvent(type=SlackEventType.MESSAGE, data=body["event"], user=body["event"]
                                ["user"], channel=body["event"]["channel"], message_id=body["event"]["client_msg_id"])
-            await self.event_queue.put(event)
-            await self.client.add_reaction(event, self.config.get_emoji("ai_thinking"))
-        await ack()
+            if await self._enqueue_event(event):
+                self.effects.add_reaction(event, self.config.get_emoji("ai_thinking"))
 
     async def _handle_app_mention(self, body: Dict[str, Any], ack: AsyncAck) -> None:
+        await ack()
         self.logger.info("got slack app_mention event",
-                         slack_body=json.dumps(body, ensure_ascii=False))
-        if "edited" not in body["event"]:
+                         slack_body=LazyJSON(body))
+        if "edited" not in body["event"] and not await self._is_duplicate_event(body):
             event = SlackEvent(type=SlackEventType.APP_MENTION, data=body["event"], user=body["event"]
                                ["user"], channel=body["event"]["channel"], message_id=body["event"]["client_msg_id"])
-            await self.event_queue.put(event)
-            await self.client.add_reaction(event, self.config.get_emoji("ai_thinking"))
-        await ack()
+            if await self._enqueue_event(event):
+                self.effects.add_reaction(event, self.config.get_emoji("ai_thinking"))
 
     async def _handle_reaction_added(self, body: Dict[str, Any], ack: AsyncAck) -> None:
-        self.logger.info("got slack reaction_added event",
-                         slack_body=json.dumps(body, ensure_ascii=False))
-        await self.event_queue.put(SlackEvent(type=SlackEventType.REACTION_ADDED, data=body["event"], user=body["event"]["user"], channel=body["event"]["item"]["channel"]))
         await ack()
+        self.logger.info("got slack reaction_added event",
+                         slack_body=LazyJSON(body))
+        # only reactions on the bot's own replies are feedback
+        if self.tracker is not None and body["event"].get("item_user") == self.config.bot_id and not await self._is_duplicate_event(body):
+            event = SlackEvent(type=SlackEventType.REACTION_ADDED, data=body["event"],
+                               user=body["event"]["user"], channel=body["event"]["item"]["channel"])
+            await self._enqueue_event(event)
 
     async def _process_message_event(self, event: SlackEvent) -> None:
-        event.session_id = self.client.find_session_id(
+        event.session_id = await self.find_session_id(
             event, in_replies=self.config.assistant)
 
         runnable_config = await self.create_runnable_config(event, fetch_conversations_replies=False)
@@ -144,47 +243,17 @@ class SlackBot:
                 runnable_config)
 
         if not self.config.assistant:
-            chain = create_check_new_conversation_chain(
-                self.agent_config)
-            is_new_conversation = await chain.ainvoke(
-                input={"input": event.data["text"]},
-                config=runnable_config,
-            )
-            if is_new_conversation.strip().lower() == "yes":
-                await self.client.remove_reaction(event, self.config.get_emoji("ai_thinking"))
-                event.session_id = None
-                await self.client.reply_blocks(event, self.config.get_message("new_conversation_title"), [
-                    {
-                        "type": "context",
-                        "elements": [
-                            {
-                                "type": "plain_text",
-                                "text": self.config.get_message("new_conversation_message"),
-                                "emoji": True
-                            }
-                        ]
-                    },
-                ])
+            if self.config.speculative_agent_run:
+                await self._reply_with_agent_speculatively(event, runnable_config)
+                return
+            if await self._check_new_conversation(event, runnable_config):
+                await self._reply_new_conversation(event)
                 return
 
-        agent = create_supervisor_graph(self.agent_config, self.config)
-        agent_result = await agent.ainvoke(
-            input={
-                "messages": [HumanMessage(content=self.client.replace_channel_id_with_url(event.data["text"]))]
-            },
-            config=runnable_config,
-        )
-        self.logger.debug("agent_result", agent_result=agent_result)
-
-        if not self.config.assistant:
-            await self.client.remove_reaction(event, self.config.get_emoji("ai_thinking"))
-
-        content, references = parse_agent_result(
-            self.agent_config, agent_result)
-        await self.client.reply_markdown(event, content, references, in_replies=self.config.assistant)
+        await self._reply_with_agent(event, runnable_config, in_replies=self.config.assistant)
 
     async def _process_app_mention_event(self, event: SlackEvent) -> None:
-        event.session_id = self.client.find_session_id(
+        event.session_id = await self.find_session_id(
             event, in_replies=True)
 
         runnable_config = await self.create_runnable_config(event)
@@ -192,36 +261,218 @@ class SlackBot:
             runnable_config = self.tracker.inject_runnable_config(
                 runnable_config)
 
-        agent = create_supervisor_graph(self.agent_config, self.config)
-        agent_result = await agent.ainvoke(
-            input={
-                "messages": [HumanMessage(content=self.client.replace_channel_id_with_url(event.data["text"]))]
-            },
+        await self._reply_with_agent(event, runnable_config, in_replies=True)
+
+    async def _check_new_conversation(self, event: SlackEvent, runnable_config: RunnableConfig) -> bool:
+        chain = create_check_new_conversation_chain(
+            self.agent_config)
+        is_new_conversation = await chain.ainvoke(
+            input={"input": event.data["text"]},
             config=runnable_config,
         )
+        return is_new_conversation.strip().lower() == "yes"
+
+    async def _reply_new_conversation(self, event: SlackEvent) -> None:
+        self.effects.remove_reaction(event, self.config.get_emoji("ai_thinking"))
+        event.session_id = None
+        ts = await self.client.reply_blocks(event, self.config.get_message("new_conversation_title"), [
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "plain_text",
+                        "text": self.config.get_message("new_conversation_message"),
+                        "emoji": True
+                    }
+                ]
+            },
+        ])
+        await self._index_reply(event, ts, self.config.get_message("new_conversation_title"))
+
+    async def _reply_with_agent(self, event: SlackEvent, runnable_config: RunnableConfig, in_replies: bool) -> None:
+        reply = SlackStreamingReply(
+            self.client, self.effects, self.config, event, in_replies, self.logger) if self.config.stream_reply else None
+        try:
+            if reply is not None:
+                await reply.start()
+            agent_result = await self._run_agent(event, runnable_config, reply)
+            await self._send_agent_result(event, agent_result, in_replies, reply)
+        except Exception:
+            if reply is not None:
+                await reply.abort()
+            raise
+        finally:
+            if reply is not None:
+                await reply.stop()
+
+    async def _reply_with_agent_speculatively(self, event: SlackEvent, runnable_config: RunnableConfig) -> None:
+        """
+        Run the agent while the new conversation check is still deciding, instead of after it.
+
+        Nothing is posted until the check answers. If the message starts a new conversation the agent run is
+        cancelled and any checkpoint it wrote is reverted, so the session looks as if it never ran.
+        """
+        agent = get_supervisor_graph(self.agent_config, self.config)
+        thread_config = RunnableConfig(
+            configurable={"thread_id": runnable_config["configurable"]["thread_id"]})
+        previous_state = await agent.aget_state(thread_config)
+
+        # the buffered streaming reply is only started once the answer is known to be wanted
+        reply = SlackStreamingReply(
+            self.client, self.effects, self.config, event, False, self.logger) if self.config.stream_reply else None
+        started_at = time.monotonic()
+        agent_task = asyncio.create_task(self._run_agent(
+            event, runnable_config, reply, checkpoint_during=False))
+        try:
+            # the agent run owns run_id, a concurrent run must not share it
+            is_new_conversation = await self._check_new_conversation(
+                event, {k: v for k, v in runnable_config.items() if k != "run_id"})
+        except BaseException:
+            agent_task.cancel()
+            await asyncio.gather(agent_task, return_exceptions=True)
+            await self._revert_agent_run(agent, thread_config, previous_state)
+            raise
+
+        self.speculation_stats["runs"] += 1
+        if is_new_conversation:
+            agent_task.cancel()
+            await asyncio.gather(agent_task, return_exceptions=True)
+            await self._revert_agent_run(agent, thread_config, previous_state)
+            self.speculation_stats["wasted"] += 1
+            self.logger.info("speculative agent run wasted", check_time=round(time.monotonic() - started_at, 3),
+                             **self.speculation_stats)
+            await self._reply_new_conversation(event)
+            return
+
+        self.logger.info("speculative agent run kept", check_time=round(time.monotonic() - started_at, 3),
+                         **self.speculation_stats)
+        try:
+            if reply is not None:
+                await reply.start()
+            agent_result = await agent_task
+            await self._send_agent_result(event, agent_result, False, reply)
+        except Exception:
+            if reply is not None:
+                await reply.abort()
+            raise
+        finally:
+            if reply is not None:
+                await reply.stop()
+
+    async def _revert_agent_run(self, agent: CompiledStateGraph, thread_config: RunnableConfig, previous_state: StateSnapshot) -> None:
+        # a cancelled run still saves a checkpoint on exit, even with checkpoint_during=False
+        current_state = await agent.aget_state(thread_config)
+        previous_checkpoint_id = previous_state.config["configurable"].get(
+            "checkpoint_id")
+        if current_state.config["configurable"].get("checkpoint_id") == previous_checkpoint_id:
+            return
+        if previous_checkpoint_id is not None:
+            await agent.aupdate_state(previous_state.config, None, as_node="__copy__")
+        else:
+            await agent.aupdate_state(thread_config, {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)]},
+                                      as_node=SUPERVISOR_NAME)
+        self.logger.info("reverted speculative agent run",
+                         thread_id=thread_config["configurable"]["thread_id"], checkpoint_id=previous_checkpoint_id)
+
+    async def _run_agent(self, event: SlackEvent, runnable_config: RunnableConfig, reply: Optional[SlackStreamingReply],
+                         checkpoint_during: Optional[bool] = None) -> Dict[str, Any]:
+        agent = get_supervisor_graph(self.agent_config, self.config)
+        agent_input = {
+            "messages": [HumanMessage(content=self.client.replace_channel_id_with_url(event.data["text"]))]
+        }
+
+        if reply is None:
+            agent_result = await agent.ainvoke(input=agent_input, config=runnable_config, checkpoint_during=checkpoint_during)
+        else:
+            agent_result = None
+            async for mode, chunk in agent.astream(agent_input, config=runnable_config, stream_mode=["messages", "values"],
+                                                   checkpoint_during=checkpoint_during):
+                if mode == "messages":
+                    await reply.on_message(*chunk)
+                else:
+                    agent_result = chunk
         self.logger.debug("agent_result", agent_result=agent_result)
+        return agent_result
+
+    async def _send_agent_result(self, event: SlackEvent, agent_result: Dict[str, Any], in_replies: bool,
+                                 reply: Optional[SlackStreamingReply]) -> None:
+        # the assistant thread shows a status instead of the thinking reaction
+        if event.type == SlackEventType.APP_MENTION or not self.config.assistant:
+            self.effects.remove_reaction(event, self.config.get_emoji("ai_thinking"))
 
         content, references = parse_agent_result(
             self.agent_config, agent_result)
-        await self.client.remove_reaction(event, self.config.get_emoji("ai_thinking"))
-        await self.client.reply_markdown(event, content, references, in_replies=True)
+        if reply is None:
+            ts = await self.client.reply_markdown(event, content, references, in_replies=in_replies)
+        else:
+            ts = await reply.finish(content, references)
+        # a long answer spans several messages, feedback on any of them is about the whole answer
+        text = self.client.clean_markdown(content)
+        for message_ts in ts:
+            await self._index_reply(event, message_ts, text)
+        if any(artifact.title_key is not None for reference in references for artifact in reference.artifacts):
+            self.effects.update_message(event, ts[-1], lambda: self._fill_in_titles(event, ts, content, references))
+
+    async def _fill_in_titles(self, event: SlackEvent, ts: List[str], content: str, references: List[Reference]) -> None:
+        """Replace the fallback titles of a posted reply's references with the llm titles once they are generated."""
+        title_store = self.agent_config.get_title_store()
+        updated = False
+        for reference in references:
+            for artifact in reference.artifacts:
+                if artifact.title_key is None:
+                    continue
+                if (title := await wait_for_title(title_store, artifact.title_key)) is not None and title != artifact.title:
+                    artifact.title = title
+                    updated = True
+        if updated:
+            await self.client.update_references(event, ts, content, references)
+
+    async def _index_reply(self, event: SlackEvent, ts: str, text: str) -> None:
+        """
+        Remember what a reply answered, so reaction feedback on it needs no slack lookup.
+
+        The reply is already posted, a failure only costs a lookup when the reply gets a reaction.
+        """
+        payload = self.client.build_reply_metadata(event)["event_payload"]
+        try:
+            await self.reply_index.set(f"{event.channel}-{ts}", {
+                "reply_message_id": payload["reply_message_id"],
+                "reply_message": payload["reply_message"],
+                "text": text,
+            })
+        except Exception as e:
+            self.logger.warning("failed to index reply", channel=event.channel, ts=ts, error=str(e))
 
     async def _process_reaction_added_event(self, event: SlackEvent) -> None:
         if self.tracker is None:
             return
 
-        replies = await self.client.fetch_conversations_replies(event.channel, event.data["item"]["ts"])
-        for reply in replies:
-            if reply["ts"] == event.data["item"]["ts"]:
-                try:
-                    self.logger.debug("found reply", reply=json.dumps(
-                        reply, ensure_ascii=False))
-                    self.tracker.collect_emoji_feedback(reply["metadata"]["event_payload"]["reply_message_id"], event.user,
-                                                        reply["metadata"]["event_payload"]["reply_message"], reply["text"], event.data["reaction"], "slack")
-                except KeyError:
-                    self.logger.warning("no message_id or message found in reply",
-                                        reply=json.dumps(reply, ensure_ascii=False))
-                break
+        ts = event.data["item"]["ts"]
+        reply = await self.reply_index.get(f"{event.channel}-{ts}")
+        if reply is None:
+            self.logger.debug("reply not indexed, fetching message",
+                              channel=event.channel, ts=ts)
+            if (message := await self.client.fetch_message(event.channel, ts)) is None:
+                self.logger.warning("reacted message not found",
+                                    channel=event.channel, ts=ts)
+                return
+            try:
+                reply = {
+                    "reply_message_id": message["metadata"]["event_payload"]["reply_message_id"],
+                    "reply_message": message["metadata"]["event_payload"]["reply_message"],
+                    "text": message["text"],
+                }
+            except KeyError:
+                self.logger.warning("no message_id or message found in reply",
+                                    reply=LazyJSON(message))
+                return
+
+        self.tracker.collect_emoji_feedback(reply["reply_message_id"], event.user,
+                                            reply["reply_message"], reply["text"], event.data["reaction"], "slack")
+
+    async def find_session_id(self, event: SlackEvent, in_replies: bool = False) -> str:
+        return await self.session_store.get_or_create(
+            self.client.get_session_key(event, in_replies), event.data["client_msg_id"])
 
     async def create_runnable_config(self, event: SlackEvent, fetch_conversations_replies: bool = False) -> RunnableConfig:
         context = f"""
@@ -235,9 +486,8 @@ class SlackBot:
 
         if fetch_conversations_replies:
             context += "- Current slack conversations are as follows:"
-            replies = await self.client.fetch_conversations_replies(
-                event.channel, event.data["thread_ts"] if "thread_ts" in event.data else event.data["ts"])
-            for reply in replies:
+            async for reply in self.client.iter_conversations_replies(
+                    event.channel, event.data["thread_ts"] if "thread_ts" in event.data else event.data["ts"]):
                 context += f"""
 <slack_conversation>
 {message_to_text(reply)}
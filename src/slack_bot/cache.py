@@ -0,0 +1,150 @@
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .types import SlackMessage
+
+# a thread is keyed by its channel and thread ts, a channel's history by the channel and None
+ConversationKey = Tuple[str, Optional[str]]
+
+
+def _ts_key(message: SlackMessage) -> Tuple[int, ...]:
+    return tuple(int(part) for part in message["ts"].split("."))
+
+
+@dataclass
+class CachedConversation:
+    """A contiguous run of a conversation in api order: oldest first for a thread, newest first for a history."""
+    messages: List[SlackMessage] = field(default_factory=list)
+    complete: bool = False
+    refreshed_at: float = 0.0
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.monotonic() - self.refreshed_at < ttl
+
+
+class ConversationCache:
+    """
+    Keep recently read threads and channel histories, shared by every client of the process.
+
+    Entries are evicted least recently used beyond max_size, and a conversation growing past max_messages
+    is dropped. An entry is fresh for ttl seconds after its newest end was last synced with slack, after
+    that the clients fetch only the messages newer than the cached ones. Message and app_mention events
+    seen by the bot extend fresh entries in place, edits and deletions invalidate them. Slack does not
+    send the bot its own messages, so the clients invalidate the conversations they post to.
+
+    The refresh relies on the cached run having no gap up to its newest message, so an event only
+    extends an entry when this process receives every event (sees_all_events, false when several Socket
+    Mode processes share them) and the entry is fresh. Otherwise the entry is invalidated and refetched.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 30.0, max_messages: int = 1000, sees_all_events: bool = True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.sees_all_events = sees_all_events
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[ConversationKey,
+                                   CachedConversation] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: ConversationKey) -> Optional[CachedConversation]:
+        """Return a snapshot of the entry, safe to read while other clients update it."""
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return CachedConversation(list(entry.messages), entry.complete, entry.refreshed_at)
+
+    def find(self, channel: str, ts: str) -> Optional[SlackMessage]:
+        with self._lock:
+            for (entry_channel, _), entry in self._entries.items():
+                if entry_channel != channel:
+                    continue
+                for message in entry.messages:
+                    if message["ts"] == ts:
+                        return message
+        return None
+
+    def merge(self, key: ConversationKey, messages: List[SlackMessage], complete: Optional[bool] = None,
+              refreshed: bool = False, create: bool = True) -> None:
+        """
+        Merge messages adjacent to or overlapping the cached run into it.
+
+        Refetched messages, such as the parent slack returns with every page of a thread, replace the
+        cached copy.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                if not create:
+                    return
+                entry = self._entries[key] = CachedConversation()
+
+            merged = {message["ts"]: message for message in entry.messages}
+            merged.update((message["ts"], message) for message in messages)
+            if len(merged) > self.max_messages:
+                del self._entries[key]
+                return
+            entry.messages = sorted(
+                merged.values(), key=_ts_key, reverse=key[1] is None)
+            if complete is not None:
+                entry.complete = complete
+            if refreshed:
+                entry.refreshed_at = time.monotonic()
+
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: ConversationKey) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Apply a message or app_mention event received by the bot to the cached conversations it belongs to."""
+        if event.get("type") not in ("message", "app_mention") or (channel := event.get("channel")) is None:
+            return
+
+        if subtype := event.get("subtype"):
+            if subtype in ("message_changed", "message_deleted"):
+                message = event.get("message") or event.get(
+                    "previous_message") or {}
+                self.invalidate((channel, None))
+                self.invalidate(
+                    (channel, message.get("thread_ts") or message.get("ts")))
+            return
+
+        # a mention is a plain message in the conversation api
+        message = {key: value for key, value in event.items()
+                   if key not in ("channel", "event_ts", "channel_type")} | {"type": "message"}
+        if (thread_ts := event.get("thread_ts")) and thread_ts != event["ts"]:
+            # a reply only extends a thread cached up to its end. the channel history keeps the parent,
+            # whose reply count is now outdated
+            self._extend((channel, thread_ts), message, thread=True)
+            self.invalidate((channel, None))
+        else:
+            self._extend((channel, None), message, thread=False)
+
+    def _extend(self, key: ConversationKey, message: SlackMessage, thread: bool) -> None:
+        """Append an observed message to an entry known to have no gap before it, invalidate the entry otherwise."""
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return
+            contiguous = self.sees_all_events and entry.is_fresh(self.ttl) and (entry.complete or not thread)
+        if contiguous:
+            self.merge(key, [message], create=False)
+        else:
+            self.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -1,37 +1,92 @@
 import re
-import json
 import logging
 import backoff
+import aiohttp
 from urllib.parse import urlparse, parse_qs
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
 from slack_sdk.web.async_client import AsyncWebClient
 from slack_sdk.web import WebClient
+from slack_sdk.web.async_slack_response import AsyncSlackResponse
+from slack_sdk.web.slack_response import SlackResponse
 from slack_sdk.errors import SlackApiError
 
 from config import SlackConfig, LoggerConfig
+from config.logger import LazyJSON
 from agent.parser import Reference
 from .types import SlackEvent, SlackMessage, SlackChannelHistory
+from .cache import CachedConversation
+from .markdown import MarkdownChunk, render_markdown, to_mrkdwn
 
+RETRYABLE_ERRORS = (SlackApiError, OSError, aiohttp.ClientError)
 
-def slack_api_error_is_not_retryable(e: SlackApiError):
-    return e.response.status_code != 429
+
+def slack_api_error_is_not_retryable(e: Exception) -> bool:
+    # 429s were already retried by the rate limiter, a page is retried on top of that and on server or network errors
+    if isinstance(e, SlackApiError):
+        return e.response.status_code != 429 and e.response.status_code < 500
+    return False
+
+
+class SlackPaginationError(Exception):
+    """A page kept failing. result holds what was fetched before it, pass cursor back to resume from it."""
+
+    def __init__(self, result: SlackChannelHistory | List[SlackMessage], cursor: Optional[str]):
+        super().__init__(f"failed to fetch page at cursor {cursor!r}")
+        self.result = result
+        self.cursor = cursor
 
 
 class BaseSlackClient:
     def __init__(self, config: SlackConfig, logger: Optional[logging.Logger] = None):
         self.logger = logger or config.get_logger()
         self.config = config
+        self.rate_limiter = config.get_rate_limiter()
+        self.conversation_cache = config.get_conversation_cache()
+
+    def _use_conversation_cache(self, cache: bool, max_pages: Optional[int], cursor: Optional[str]) -> bool:
+        # paging explicitly reads a given part of the conversation, bypassing the cache
+        return cache and max_pages is None and cursor is None and self.conversation_cache.max_size > 0
+
+    def _get_cached_conversation(self, params: Dict[str, Any]) -> Tuple[Tuple[str, Optional[str]], CachedConversation, bool]:
+        # thread urls give the ts as a float, events as the string slack formats with 6 decimals
+        ts = params.get("ts")
+        key = (params["channel"], f"{ts:.6f}" if isinstance(ts, float) else ts)
+        entry = self.conversation_cache.get(key) or CachedConversation()
+        return key, entry, entry.is_fresh(self.conversation_cache.ttl)
+
+    @staticmethod
+    def _get_gap_params(params: Dict[str, Any], entry: CachedConversation) -> Dict[str, Any]:
+        # what follows the cached run: older messages of a history, newer replies of a thread
+        if not entry.messages:
+            return params
+        return {**params, "oldest" if "ts" in params else "latest": entry.messages[-1]["ts"]}
+
+    def _invalidate_replied_conversation(self, event: SlackEvent) -> None:
+        # slack does not send the bot the events of its own messages, the cached thread and history miss them
+        self.conversation_cache.invalidate(
+            (event.channel, event.data.get("thread_ts") or event.data["ts"]))
+        self.conversation_cache.invalidate((event.channel, None))
+
+    def _store_gap(self, key: Tuple[str, Optional[str]], entry: CachedConversation, fetched: Optional[List[SlackMessage]], complete: bool) -> None:
+        if fetched is None:
+            self.conversation_cache.invalidate(key)
+            return
+        # a history is synced by fetching from its newest message, a thread by reaching its last reply
+        refreshed = not entry.messages if key[1] is None else complete
+        self.conversation_cache.merge(
+            key, fetched, complete=True if complete else None, refreshed=refreshed)
 
     @staticmethod
     def clean_markdown(text: str) -> str:
-        text = re.sub(r"^```[^\n]*\n", "```\n", text, flags=re.MULTILINE)
-        text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r"<\2|\1>", text)
-        text = re.sub(r"\*\*([^*]+)\*\*", r"*\1*", text)
-        text = re.sub(r"(?<!\*)\*([^*]+)\*(?!\*)", r"_\1_", text)
-        text = re.sub(r"_([^_]+)_", r"_\1_", text)
-        text = re.sub(r"^\s*[-*]\s", "• ", text, flags=re.MULTILINE)
-        return text
+        return to_mrkdwn(text)
+
+    def render_markdown(self, markdown: str) -> List[MarkdownChunk]:
+        """Render an answer into the chunks posted as consecutive messages, each at most reply_max_length long."""
+        chunks = render_markdown(markdown, self.config.reply_max_length)
+        if len(chunks) > 1:
+            self.logger.debug("splitting long slack reply", markdown_length=len(markdown), messages=len(chunks))
+        return chunks
 
     @staticmethod
     def get_channel_url_info(url: str) -> str:
@@ -74,25 +129,51 @@ class BaseSlackClient:
         raise ValueError(f"Invalid Slack Thread URL: {url}")
 
     @staticmethod
-    def find_session_id(event: SlackEvent, in_replies: bool = False) -> str:
+    def get_session_key(event: SlackEvent, in_replies: bool = False) -> str:
         if in_replies:
             thread_ts = event.data["thread_ts"] if "thread_ts" in event.data else event.data["ts"]
-            session_key = f"{event.channel}-{thread_ts}"
-        else:
-            session_key = event.channel
+            return f"{event.channel}-{thread_ts}"
+        return event.channel
 
-        try:
-            with open(f"./output/{session_key}", "r", encoding="utf-8") as f:
-                session_id = f.read().strip()
-        except FileNotFoundError:
-            session_id = ""
+    def build_markdown_blocks(self, markdown: str, references: Optional[List[Reference]] = None, disclaimer: bool = True) -> List[Dict[str, Any]]:
+        blocks = [{
+            "type": "markdown",
+            "text": markdown
+        }]
 
-        if session_id == "":
-            session_id: str = event.data["client_msg_id"]
-            with open(f"./output/{session_key}", "w", encoding="utf-8") as f:
-                f.write(session_id)
+        if references:
+            for reference in references:
+                artifact_text = "\n".join(
+                    [f"<{artifact.link}|{artifact.title}>" for artifact in reference.artifacts])
+                blocks.append({
+                    "type": "context",
+                    "elements": [{
+                        "type": "mrkdwn",
+                        "text": f"{reference.icon_emoji} *{reference.title}*\n`#{reference.source}`\n{artifact_text}"
+                    }]
+                })
+
+        if disclaimer:
+            blocks.append({
+                "type": "context",
+                "elements": [{
+                        "type": "mrkdwn",
+                        "text": self.config.get_message("content_disclaimer_message")
+                }]
+            })
 
-        return session_id
+        return blocks
+
+    @staticmethod
+    def build_reply_metadata(event: SlackEvent) -> Dict[str, Any]:
+        return {
+            "event_type": f"reply_{event.type.value}",
+            "event_payload": {
+                "reply_message": event.data["text"],
+                "reply_message_id": event.message_id or event.data["client_msg_id"],
+                "reply_session_id": event.session_id or event.message_id or event.data["client_msg_id"],
+            }
+        }
 
     def replace_channel_id_with_url(self, text: str) -> str:
         return re.sub(r"<#([A-Z0-9]+)\|>",
@@ -135,173 +216,204 @@ class SlackClient(BaseSlackClient):
         super().__init__(config, logger)
         self.client = client or WebClient(token=config.bot_token)
 
-    @backoff.on_exception(backoff.expo, SlackApiError, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
-    def fetch_conversations_history(self, channel: str, limit: Optional[int], size: int = 15) -> SlackChannelHistory:
-        result = SlackChannelHistory(channel=channel, pages=[])
-        pages = 1
-
-        history = self.client.conversations_history(
-            channel=channel, include_all_metadata=True, limit=size)
-        result["pages"].append(history.data)
-        self.logger.info(
-            "fetch conversations history",
-            page=pages,
-            messages=len(history.data["messages"]),
-            has_more=history.data["has_more"])
-
-        while limit is not None and pages < limit:
+    def fetch_conversations_history(self, channel: str, limit: Optional[int], size: int = 15, cursor: Optional[str] = None) -> SlackChannelHistory:
+        """
+        Fetch up to limit pages of a channel's history, starting at cursor if given.
+
+        Every page is retried on its own, so a failure never refetches the pages before it. When a page
+        still fails, SlackPaginationError carries the pages fetched so far and the cursor to resume from.
+        """
+        result = SlackChannelHistory(
+            channel=channel, pages=[], next_cursor=cursor)
+        pages = 0
+
+        while pages < (limit or 1):
             pages += 1
-            if not history.data["has_more"]:
-                break
-            cursor = history.data["response_metadata"]["next_cursor"]
-            history = self.client.conversations_history(
-                channel=channel, include_all_metadata=True, cursor=cursor, limit=size)
+            cursor = result["next_cursor"]
+            try:
+                history = self._fetch_page(self.client.conversations_history,
+                                           channel=channel, include_all_metadata=True, cursor=cursor, limit=size)
+            except RETRYABLE_ERRORS as e:
+                raise SlackPaginationError(result, cursor) from e
             result["pages"].append(history.data)
+            result["next_cursor"] = history.data["response_metadata"]["next_cursor"] if history.data["has_more"] else None
             self.logger.info(
-                "fetch channel history",
+                "fetch conversations history",
                 page=pages,
                 messages=len(history.data["messages"]),
                 cursor=cursor,
                 has_more=history.data["has_more"])
+            if result["next_cursor"] is None:
+                break
 
         self.logger.debug("slack.client.conversations_history",
-                          slack_channel_history=json.dumps(result, ensure_ascii=False))
+                          slack_channel_history=LazyJSON(result))
 
         return result
 
-    @backoff.on_exception(backoff.expo, SlackApiError, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
-    def fetch_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None) -> List[SlackMessage]:
+    def fetch_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> List[SlackMessage]:
+        """Fetch the replies of a thread, resumable like fetch_conversations_history."""
         self.logger.info("fetching conversations replies",
-                         channel=channel, ts=ts)
+                         channel=channel, ts=ts, cursor=cursor)
         messages = []
-        cursor = None
-
-        while True:
-            if cursor:
-                response = self.client.conversations_replies(
-                    channel=channel,
-                    ts=ts,
-                    limit=15,
-                    cursor=cursor,
-                    include_all_metadata=True,
-                )
-            else:
-                response = self.client.conversations_replies(
-                    channel=channel,
-                    ts=ts,
-                    limit=15,
-                    include_all_metadata=True,
-                )
-            messages.extend(response["messages"])
-            if not response.get("has_more"):
-                break
-            cursor = response["response_metadata"]["next_cursor"]
+        try:
+            for message in self.iter_conversations_replies(channel, ts, limit, size=15, cursor=cursor):
+                messages.append(message)
+        except SlackPaginationError as e:
+            e.result = messages
+            raise
 
-        self.logger.debug("slack.client.conversations_replies", slack_thread_replies=json.dumps(
-            messages, ensure_ascii=False))
+        self.logger.debug("slack.client.conversations_replies", slack_thread_replies=LazyJSON(messages))
 
-        if limit is not None:
-            return messages[:limit]
         return messages
 
+    def iter_conversations_history(self, channel: str, limit: Optional[int] = None, max_pages: Optional[int] = None, size: int = 200,
+                                   cursor: Optional[str] = None, until: Optional[Callable[[SlackMessage], bool]] = None,
+                                   cache: bool = True) -> Iterator[SlackMessage]:
+        """
+        Yield the messages of a channel, newest first, as their pages arrive.
+
+        Fetching stops after limit messages or max_pages pages, or at the first message for which until
+        returns True, which is not yielded. Only the current page is held in memory. A page failing after
+        its retries raises SlackPaginationError with the cursor to resume from.
+
+        Unless paging with cursor or max_pages, or with cache=False, the messages are served from the
+        conversation cache, which asks slack only for the messages it does not hold yet.
+        """
+        if self._use_conversation_cache(cache, max_pages, cursor):
+            return self._iter_cached_messages(self.client.conversations_history, {"channel": channel}, limit, size, until)
+        return self._iter_messages(self.client.conversations_history, {"channel": channel}, limit, max_pages, size, cursor, until)
+
+    def iter_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None, max_pages: Optional[int] = None, size: int = 200,
+                                   cursor: Optional[str] = None, until: Optional[Callable[[SlackMessage], bool]] = None,
+                                   cache: bool = True) -> Iterator[SlackMessage]:
+        """Yield the messages of a thread, oldest first, like iter_conversations_history."""
+        if self._use_conversation_cache(cache, max_pages, cursor):
+            return self._iter_cached_messages(self.client.conversations_replies, {"channel": channel, "ts": ts}, limit, size, until)
+        return self._iter_messages(self.client.conversations_replies, {"channel": channel, "ts": ts}, limit, max_pages, size, cursor, until)
+
+    def _iter_cached_messages(self, func: Callable[..., SlackResponse], params: Dict[str, Any], limit: Optional[int], size: int,
+                              until: Optional[Callable[[SlackMessage], bool]]) -> Iterator[SlackMessage]:
+        key, entry, fresh = self._get_cached_conversation(params)
+        max_messages = self.conversation_cache.max_messages
+        if entry.messages and key[1] is None and not fresh:
+            # new messages head a history, so they are fetched before serving the cached ones
+            newer = list(self._iter_messages(func, {**params, "oldest": entry.messages[0]["ts"]},
+                                             max_messages + 1, None, size, None, None))
+            if len(newer) > max_messages:
+                self.conversation_cache.invalidate(key)
+                yield from self._iter_messages(func, params, limit, None, size, None, until)
+                return
+            self.conversation_cache.merge(key, newer, refreshed=True)
+            entry.messages = newer + entry.messages
+            fresh = True
+
+        count = 0
+        for message in entry.messages:
+            if until is not None and until(message):
+                return
+            yield message
+            count += 1
+            if limit is not None and count >= limit:
+                return
+        if entry.complete and fresh:
+            return
+
+        cached = {message["ts"] for message in entry.messages}
+        fetched: Optional[List[SlackMessage]] = []
+        complete = False
+        try:
+            # one more message per page for the thread parent slack repeats on every page
+            for message in self._iter_messages(func, self._get_gap_params(params, entry), None, None,
+                                               size if limit is None else min(size, limit - count + 1), None, None):
+                if fetched is not None:
+                    fetched.append(message)
+                    if len(fetched) > max_messages:
+                        fetched = None
+                if message["ts"] in cached:
+                    continue
+                if until is not None and until(message):
+                    return
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            complete = True
+        finally:
+            self._store_gap(key, entry, fetched, complete)
+
+    def _iter_messages(self, func: Callable[..., SlackResponse], params: Dict[str, Any], limit: Optional[int], max_pages: Optional[int],
+                       size: int, cursor: Optional[str], until: Optional[Callable[[SlackMessage], bool]]) -> Iterator[SlackMessage]:
+        count = pages = 0
+        while max_pages is None or pages < max_pages:
+            pages += 1
+            try:
+                response = self._fetch_page(func, **params, include_all_metadata=True, cursor=cursor,
+                                            limit=size if limit is None else min(size, limit - count))
+            except RETRYABLE_ERRORS as e:
+                raise SlackPaginationError([], cursor) from e
+            self.logger.info("fetched conversations page", method=self.rate_limiter.get_method(func), page=pages,
+                             messages=len(response["messages"]), cursor=cursor, has_more=response.get("has_more", False), **params)
+
+            for message in response["messages"]:
+                if until is not None and until(message):
+                    return
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+            if not response.get("has_more"):
+                return
+            cursor = response["response_metadata"]["next_cursor"]
+
+    @backoff.on_exception(backoff.expo, RETRYABLE_ERRORS, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
+    def _fetch_page(self, func: Callable[..., SlackResponse], **kwargs: Any) -> SlackResponse:
+        return self.rate_limiter.call(func, **kwargs)
+
     def add_reaction(self, event: SlackEvent, reaction: str) -> None:
-        response = self.client.reactions_add(
+        response = self.rate_limiter.call(self.client.reactions_add,
             channel=event.channel,
             timestamp=event.data["ts"],
             name=reaction.strip(":"),
         )
         self.logger.debug("slack.client.reactions_add", reaction=reaction,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
+                          slack_response=LazyJSON(response.data))
 
     def remove_reaction(self, event: SlackEvent, reaction: str) -> None:
-        response = self.client.reactions_remove(
+        response = self.rate_limiter.call(self.client.reactions_remove,
             channel=event.channel,
             timestamp=event.data["ts"],
             name=reaction.strip(":"),
         )
         self.logger.debug("slack.client.reactions_remove", reaction=reaction,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
-
-    def reply_markdown(self, event: SlackEvent, markdown: str, references: Optional[List[Reference]] = None, in_replies: bool = False) -> None:
-        blocks = [{
-            "type": "markdown",
-            "text": markdown
-        }]
-
-        if len(blocks[0]["text"]) > 10000:
-            blocks[0]["text"] = blocks[0]["text"][:10000]
-            blocks.append({
-                "type": "context",
-                "elements": [
-                    {
-                        "type": "plain_text",
-                        "text": self.config.get_message("ai_reply_too_long_warning_message"),
-                        "emoji": True
-                    }
-                ]
-            })
-            self.logger.warning("slack.client.reply_markdown got too long message",
-                                markdown_length=len(markdown))
-
-        if references:
-            for reference in references:
-                artifact_text = "\n".join(
-                    [f"<{artifact.link}|{artifact.title}>" for artifact in reference.artifacts])
-                blocks.append({
-                    "type": "context",
-                    "elements": [{
-                        "type": "mrkdwn",
-                        "text": f"{reference.icon_emoji} *{reference.title}*\n`#{reference.source}`\n{artifact_text}"
-                    }]
-                })
-
-        blocks.append({
-            "type": "context",
-            "elements": [{
-                    "type": "mrkdwn",
-                    "text": self.config.get_message("content_disclaimer_message")
-            }]
-        })
-
-        response = self.client.chat_postMessage(
-            channel=event.channel,
-            thread_ts=event.data["ts"] if in_replies else None,
-            text=self.clean_markdown(markdown),
-            blocks=blocks,
-            unfurl_links=False,
-            unfurl_media=False,
-            metadata={
-                "event_type": f"reply_{event.type.value}",
-                "event_payload": {
-                    "reply_message": event.data["text"],
-                    "reply_message_id": event.message_id or event.data["client_msg_id"],
-                    "reply_session_id": event.session_id or event.message_id or event.data["client_msg_id"],
-                }
-            }
-        )
-        self.logger.debug("slack.client.chat_postMessage", blocks=blocks,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
-
-    def reply_blocks(self, event: SlackEvent, text: str, blocks: List[Dict[str, Any]], in_replies: bool = False) -> None:
-        response = self.client.chat_postMessage(
+                          slack_response=LazyJSON(response.data))
+
+    def reply_markdown(self, event: SlackEvent, markdown: str, references: Optional[List[Reference]] = None, in_replies: bool = False) -> List[str]:
+        """Post an answer as consecutive messages of at most reply_max_length, the last one with the references. Return their ts."""
+        chunks = self.render_markdown(markdown)
+        ts = []
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            ts.append(self.reply_blocks(event, chunk.text, self.build_markdown_blocks(
+                chunk.markdown, references if last else None, disclaimer=last), in_replies))
+        return ts
+
+    def reply_blocks(self, event: SlackEvent, text: str, blocks: List[Dict[str, Any]], in_replies: bool = False) -> str:
+        response = self.rate_limiter.call(self.client.chat_postMessage,
             channel=event.channel,
             thread_ts=event.data["ts"] if in_replies else None,
             text=text,
             blocks=blocks,
             unfurl_links=False,
             unfurl_media=False,
-            metadata={
-                "event_type": f"reply_{event.type.value}",
-                "event_payload": {
-                    "reply_message": event.data["text"],
-                    "reply_message_id": event.message_id or event.data["client_msg_id"],
-                    "reply_session_id": event.session_id or event.message_id or event.data["client_msg_id"],
-                }
-            }
+            metadata=self.build_reply_metadata(event),
         )
 
-        self.logger.debug("slack.client.chat_postMessage", blocks=blocks,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
+        self.logger.debug("slack.client.chat_postMessage", blocks=LazyJSON(blocks),
+                          slack_response=LazyJSON(response.data))
+        self._invalidate_replied_conversation(event)
+        return response["ts"]
 
 
 class SlackAsyncClient(BaseSlackClient):
@@ -309,170 +421,288 @@ class SlackAsyncClient(BaseSlackClient):
         super().__init__(config, logger)
         self.client = client or AsyncWebClient(token=config.bot_token)
 
-    @backoff.on_exception(backoff.expo, SlackApiError, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
-    async def fetch_conversations_history(self, channel: str, limit: Optional[int], size: int = 15) -> SlackChannelHistory:
-        result = SlackChannelHistory(channel=channel, pages=[])
-        pages = 1
-
-        history = await self.client.conversations_history(
-            channel=channel, include_all_metadata=True, limit=size)
-        result["pages"].append(history.data)
-        self.logger.info(
-            "fetch conversations history",
-            page=pages,
-            messages=len(history.data["messages"]),
-            has_more=history.data["has_more"])
-
-        while limit is not None and pages < limit:
+    async def fetch_conversations_history(self, channel: str, limit: Optional[int], size: int = 15, cursor: Optional[str] = None) -> SlackChannelHistory:
+        """
+        Fetch up to limit pages of a channel's history, starting at cursor if given.
+
+        Every page is retried on its own, so a failure never refetches the pages before it. When a page
+        still fails, SlackPaginationError carries the pages fetched so far and the cursor to resume from.
+        """
+        result = SlackChannelHistory(
+            channel=channel, pages=[], next_cursor=cursor)
+        pages = 0
+
+        while pages < (limit or 1):
             pages += 1
-            if not history.data["has_more"]:
-                break
-            cursor = history.data["response_metadata"]["next_cursor"]
-            history = await self.client.conversations_history(
-                channel=channel, include_all_metadata=True, cursor=cursor, limit=size)
+            cursor = result["next_cursor"]
+            try:
+                history = await self._fetch_page(self.client.conversations_history,
+                                                 channel=channel, include_all_metadata=True, cursor=cursor, limit=size)
+            except RETRYABLE_ERRORS as e:
+                raise SlackPaginationError(result, cursor) from e
             result["pages"].append(history.data)
+            result["next_cursor"] = history.data["response_metadata"]["next_cursor"] if history.data["has_more"] else None
             self.logger.info(
-                "fetch channel history",
+                "fetch conversations history",
                 page=pages,
                 messages=len(history.data["messages"]),
                 cursor=cursor,
                 has_more=history.data["has_more"])
+            if result["next_cursor"] is None:
+                break
 
-        self.logger.debug("slack.client.conversations_history",
-                          slack_channel_history=json.dumps(result, ensure_ascii=False))
+        self.logger.debug("slack.async_client.conversations_history",
+                          slack_channel_history=LazyJSON(result))
 
         return result
 
-    @backoff.on_exception(backoff.expo, SlackApiError, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
-    async def fetch_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None) -> List[SlackMessage]:
+    async def fetch_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> List[SlackMessage]:
+        """Fetch the replies of a thread, resumable like fetch_conversations_history."""
         self.logger.info("fetching conversations replies",
-                         channel=channel, ts=ts)
+                         channel=channel, ts=ts, cursor=cursor)
         messages = []
-        cursor = None
-
-        while True:
-            if cursor:
-                response = await self.client.conversations_replies(
-                    channel=channel,
-                    ts=ts,
-                    limit=200,
-                    cursor=cursor,
-                    include_all_metadata=True,
-                )
-            else:
-                response = await self.client.conversations_replies(
-                    channel=channel,
-                    ts=ts,
-                    limit=200,
-                    include_all_metadata=True,
-                )
-            messages.extend(response["messages"])
+        try:
+            async for message in self.iter_conversations_replies(channel, ts, limit, cursor=cursor):
+                messages.append(message)
+        except SlackPaginationError as e:
+            e.result = messages
+            raise
+
+        self.logger.debug("slack.async_client.conversations_replies", slack_thread_replies=LazyJSON(messages))
+
+        return messages
+
+    def iter_conversations_history(self, channel: str, limit: Optional[int] = None, max_pages: Optional[int] = None, size: int = 200,
+                                   cursor: Optional[str] = None, until: Optional[Callable[[SlackMessage], bool]] = None,
+                                   cache: bool = True) -> AsyncIterator[SlackMessage]:
+        """
+        Yield the messages of a channel, newest first, as their pages arrive.
+
+        Fetching stops after limit messages or max_pages pages, or at the first message for which until
+        returns True, which is not yielded. Only the current page is held in memory. A page failing after
+        its retries raises SlackPaginationError with the cursor to resume from.
+
+        Unless paging with cursor or max_pages, or with cache=False, the messages are served from the
+        conversation cache, which asks slack only for the messages it does not hold yet.
+        """
+        if self._use_conversation_cache(cache, max_pages, cursor):
+            return self._iter_cached_messages(self.client.conversations_history, {"channel": channel}, limit, size, until)
+        return self._iter_messages(self.client.conversations_history, {"channel": channel}, limit, max_pages, size, cursor, until)
+
+    def iter_conversations_replies(self, channel: str, ts: str, limit: Optional[int] = None, max_pages: Optional[int] = None, size: int = 200,
+                                   cursor: Optional[str] = None, until: Optional[Callable[[SlackMessage], bool]] = None,
+                                   cache: bool = True) -> AsyncIterator[SlackMessage]:
+        """Yield the messages of a thread, oldest first, like iter_conversations_history."""
+        if self._use_conversation_cache(cache, max_pages, cursor):
+            return self._iter_cached_messages(self.client.conversations_replies, {"channel": channel, "ts": ts}, limit, size, until)
+        return self._iter_messages(self.client.conversations_replies, {"channel": channel, "ts": ts}, limit, max_pages, size, cursor, until)
+
+    async def _iter_cached_messages(self, func: Callable[..., Awaitable[AsyncSlackResponse]], params: Dict[str, Any], limit: Optional[int],
+                                    size: int, until: Optional[Callable[[SlackMessage], bool]]) -> AsyncIterator[SlackMessage]:
+        key, entry, fresh = self._get_cached_conversation(params)
+        max_messages = self.conversation_cache.max_messages
+        if entry.messages and key[1] is None and not fresh:
+            # new messages head a history, so they are fetched before serving the cached ones
+            newer = [message async for message in self._iter_messages(func, {**params, "oldest": entry.messages[0]["ts"]},
+                                                                      max_messages + 1, None, size, None, None)]
+            if len(newer) > max_messages:
+                self.conversation_cache.invalidate(key)
+                async for message in self._iter_messages(func, params, limit, None, size, None, until):
+                    yield message
+                return
+            self.conversation_cache.merge(key, newer, refreshed=True)
+            entry.messages = newer + entry.messages
+            fresh = True
+
+        count = 0
+        for message in entry.messages:
+            if until is not None and until(message):
+                return
+            yield message
+            count += 1
+            if limit is not None and count >= limit:
+                return
+        if entry.complete and fresh:
+            return
+
+        cached = {message["ts"] for message in entry.messages}
+        fetched: Optional[List[SlackMessage]] = []
+        complete = False
+        try:
+            # one more message per page for the thread parent slack repeats on every page
+            async for message in self._iter_messages(func, self._get_gap_params(params, entry), None, None,
+                                                     size if limit is None else min(size, limit - count + 1), None, None):
+                if fetched is not None:
+                    fetched.append(message)
+                    if len(fetched) > max_messages:
+                        fetched = None
+                if message["ts"] in cached:
+                    continue
+                if until is not None and until(message):
+                    return
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            complete = True
+        finally:
+            self._store_gap(key, entry, fetched, complete)
+
+    async def _iter_messages(self, func: Callable[..., Awaitable[AsyncSlackResponse]], params: Dict[str, Any], limit: Optional[int], max_pages: Optional[int],
+                             size: int, cursor: Optional[str], until: Optional[Callable[[SlackMessage], bool]]) -> AsyncIterator[SlackMessage]:
+        count = pages = 0
+        while max_pages is None or pages < max_pages:
+            pages += 1
+            try:
+                response = await self._fetch_page(func, **params, include_all_metadata=True, cursor=cursor,
+                                                  limit=size if limit is None else min(size, limit - count))
+            except RETRYABLE_ERRORS as e:
+                raise SlackPaginationError([], cursor) from e
+            self.logger.info("fetched conversations page", method=self.rate_limiter.get_method(func), page=pages,
+                             messages=len(response["messages"]), cursor=cursor, has_more=response.get("has_more", False), **params)
+
+            for message in response["messages"]:
+                if until is not None and until(message):
+                    return
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
             if not response.get("has_more"):
-                break
+                return
             cursor = response["response_metadata"]["next_cursor"]
 
-        self.logger.debug("slack.async_client.conversations_replies", slack_thread_replies=json.dumps(
-            messages, ensure_ascii=False))
+    @backoff.on_exception(backoff.expo, RETRYABLE_ERRORS, max_time=600, giveup=slack_api_error_is_not_retryable, logger=LoggerConfig().logger)
+    async def _fetch_page(self, func: Callable[..., Awaitable[AsyncSlackResponse]], **kwargs: Any) -> AsyncSlackResponse:
+        return await self.rate_limiter.acall(func, **kwargs)
 
-        if limit is not None:
-            return messages[:limit]
-        return messages
+    async def fetch_message(self, channel: str, ts: str) -> Optional[SlackMessage]:
+        """
+        Fetch a single message by its ts without paging through its thread.
+
+        Cached conversations are looked up first. conversations.history only returns thread parents, so a
+        threaded reply falls back to one conversations.replies call starting at the message itself.
+        """
+        if (message := self.conversation_cache.find(channel, ts)) is not None:
+            return message
+
+        response = await self.rate_limiter.acall(self.client.conversations_history,
+            channel=channel, latest=ts, inclusive=True, limit=1, include_all_metadata=True)
+        messages = response["messages"]
+        if not messages or messages[0]["ts"] != ts:
+            response = await self.rate_limiter.acall(self.client.conversations_replies,
+                channel=channel, ts=ts, oldest=ts, inclusive=True, limit=2, include_all_metadata=True)
+            messages = [message for message in response["messages"]
+                        if message["ts"] == ts]
+
+        self.logger.debug("slack.async_client.fetch_message", channel=channel, ts=ts, slack_messages=LazyJSON(messages))
+
+        return messages[0] if messages else None
 
     async def add_reaction(self, event: SlackEvent, reaction: str) -> None:
-        response = await self.client.reactions_add(
+        response = await self.rate_limiter.acall(self.client.reactions_add,
             channel=event.channel,
             timestamp=event.data["ts"],
             name=reaction.strip(":"),
         )
         self.logger.debug("slack.async_client.reactions_add", reaction=reaction,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
+                          slack_response=LazyJSON(response.data))
 
     async def remove_reaction(self, event: SlackEvent, reaction: str) -> None:
-        response = await self.client.reactions_remove(
+        response = await self.rate_limiter.acall(self.client.reactions_remove,
             channel=event.channel,
             timestamp=event.data["ts"],
             name=reaction.strip(":"),
         )
         self.logger.debug("slack.async_client.reactions_remove", reaction=reaction,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
-
-    async def reply_markdown(self, event: SlackEvent, markdown: str, references: Optional[List[Reference]] = None, in_replies: bool = False) -> None:
-        blocks = [{
-            "type": "markdown",
-            "text": markdown
-        }]
-
-        if len(blocks[0]["text"]) > 10000:
-            blocks[0]["text"] = blocks[0]["text"][:10000]
-            blocks.append({
-                "type": "context",
-                "elements": [
-                    {
-                        "type": "plain_text",
-                        "text": self.config.get_message("ai_reply_too_long_warning_message"),
-                        "emoji": True
-                    }
-                ]
-            })
-            self.logger.warning("slack.async_client.reply_markdown got too long message",
-                                markdown_length=len(markdown))
-
-        if references:
-            for reference in references:
-                artifact_text = "\n".join(
-                    [f"<{artifact.link}|{artifact.title}>" for artifact in reference.artifacts])
-                blocks.append({
-                    "type": "context",
-                    "elements": [{
-                        "type": "mrkdwn",
-                        "text": f"{reference.icon_emoji} *{reference.title}*\n`#{reference.source}`\n{artifact_text}"
-                    }]
-                })
+                          slack_response=LazyJSON(response.data))
+
+    async def reply_markdown(self, event: SlackEvent, markdown: str, references: Optional[List[Reference]] = None, in_replies: bool = False) -> List[str]:
+        """Post an answer as consecutive messages of at most reply_max_length, the last one with the references. Return their ts."""
+        chunks = self.render_markdown(markdown)
+        ts = []
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            ts.append(await self.reply_blocks(event, chunk.text, self.build_markdown_blocks(
+                chunk.markdown, references if last else None, disclaimer=last), in_replies))
+        return ts
+
+    async def update_markdown(self, event: SlackEvent, ts: str, markdown: str, references: Optional[List[Reference]] = None,
+                              final: bool = False, in_replies: bool = False) -> List[str]:
+        """
+        Update a reply posted by reply_markdown or reply_blocks in place.
 
-        blocks.append({
-            "type": "context",
-            "elements": [{
-                    "type": "mrkdwn",
-                    "text": self.config.get_message("content_disclaimer_message")
-            }]
-        })
+        Only the final update carries the references, the disclaimer and the reply metadata. A preview shows
+        the first reply_max_length of the answer, the final update posts the rest as consecutive messages
+        like reply_markdown. Return the ts of the updated message and of the messages posted after it.
+        """
+        chunks = self.render_markdown(markdown)
+        if not final:
+            chunks = chunks[:1]
+        blocks = self.build_markdown_blocks(
+            chunks[0].markdown, references if len(chunks) == 1 else None, disclaimer=final and len(chunks) == 1)
 
-        response = await self.client.chat_postMessage(
+        response = await self.rate_limiter.acall(self.client.chat_update,
             channel=event.channel,
-            thread_ts=event.data["ts"] if in_replies else None,
-            text=self.clean_markdown(markdown),
+            ts=ts,
+            text=chunks[0].text,
             blocks=blocks,
-            unfurl_links=False,
-            unfurl_media=False,
-            metadata={
-                "event_type": f"reply_{event.type.value}",
-                "event_payload": {
-                    "reply_message": event.data["text"],
-                    "reply_message_id": event.message_id or event.data["client_msg_id"],
-                    "reply_session_id": event.session_id or event.message_id or event.data["client_msg_id"],
-                }
-            }
+            metadata=self.build_reply_metadata(event) if final else None,
         )
-        self.logger.debug("slack.async_client.chat_postMessage", blocks=blocks,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
+        self.logger.debug("slack.async_client.chat_update", blocks=LazyJSON(blocks),
+                          slack_response=LazyJSON(response.data))
+        self._invalidate_replied_conversation(event)
+
+        posted = [ts]
+        for i, chunk in enumerate(chunks[1:], start=2):
+            last = i == len(chunks)
+            posted.append(await self.reply_blocks(event, chunk.text, self.build_markdown_blocks(
+                chunk.markdown, references if last else None, disclaimer=last), in_replies))
+        return posted
+
+    async def update_references(self, event: SlackEvent, ts: List[str], markdown: str, references: List[Reference]) -> None:
+        """Update the references of an answer posted by reply_markdown or a final update_markdown, ts being all its messages."""
+        chunk = self.render_markdown(markdown)[-1]
+        blocks = self.build_markdown_blocks(chunk.markdown, references, disclaimer=True)
+        response = await self.rate_limiter.acall(self.client.chat_update,
+            channel=event.channel,
+            ts=ts[-1],
+            text=chunk.text,
+            blocks=blocks,
+            metadata=self.build_reply_metadata(event),
+        )
+        self.logger.debug("slack.async_client.chat_update", blocks=LazyJSON(blocks),
+                          slack_response=LazyJSON(response.data))
+        self._invalidate_replied_conversation(event)
+
+    async def delete_message(self, event: SlackEvent, ts: str) -> None:
+        response = await self.rate_limiter.acall(self.client.chat_delete, channel=event.channel, ts=ts)
+        self.logger.debug("slack.async_client.chat_delete", ts=ts,
+                          slack_response=LazyJSON(response.data))
+        self._invalidate_replied_conversation(event)
+
+    async def set_status(self, event: SlackEvent, status: str) -> None:
+        response = await self.rate_limiter.acall(self.client.assistant_threads_setStatus,
+            channel_id=event.channel,
+            thread_ts=event.data["thread_ts"] if "thread_ts" in event.data else event.data["ts"],
+            status=status,
+        )
+        self.logger.debug("slack.async_client.assistant_threads_setStatus", status=status,
+                          slack_response=LazyJSON(response.data))
 
-    async def reply_blocks(self, event: SlackEvent, text: str, blocks: List[Dict[str, Any]], in_replies: bool = False) -> None:
-        response = await self.client.chat_postMessage(
+    async def reply_blocks(self, event: SlackEvent, text: str, blocks: List[Dict[str, Any]], in_replies: bool = False) -> str:
+        response = await self.rate_limiter.acall(self.client.chat_postMessage,
             channel=event.channel,
             thread_ts=event.data["ts"] if in_replies else None,
             text=text,
             blocks=blocks,
             unfurl_links=False,
             unfurl_media=False,
-            metadata={
-                "event_type": f"reply_{event.type.value}",
-                "event_payload": {
-                    "reply_message": event.data["text"],
-                    "reply_message_id": event.message_id or event.data["client_msg_id"],
-                    "reply_session_id": event.session_id or event.message_id or event.data["client_msg_id"],
-                }
-            }
+            metadata=self.build_reply_metadata(event),
         )
 
-        self.logger.debug("slack.async_client.chat_postMessage", blocks=blocks,
-                          slack_response=json.dumps(response.data, ensure_ascii=False))
+        self.logger.debug("slack.async_client.chat_postMessage", blocks=LazyJSON(blocks),
+                          slack_response=LazyJSON(response.data))
+        self._invalidate_replied_conversation(event)
+        return response["ts"]
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .client import SlackAsyncClient
+from .types import SlackEvent
+
+REACTION_ADD = "reaction_add"
+REACTION_REMOVE = "reaction_remove"
+STATUS = "status"
+UPDATE = "update"
+
+_OPPOSITES = {REACTION_ADD: REACTION_REMOVE, REACTION_REMOVE: REACTION_ADD}
+
+
+@dataclass
+class _Effect:
+    kind: str
+    name: str
+    run: Callable[[], Awaitable[Any]]
+
+
+class SlackSideEffects:
+    """
+    Apply reactions, assistant statuses and edits of posted replies in the background, off the ack and reply path.
+
+    Effects on the same message (or assistant thread for statuses) run one at a time in the order they
+    were scheduled, effects on different messages run concurrently. An effect that has not started yet
+    is coalesced with the next one: adding and removing the same reaction cancel out, and a newer status
+    replaces a pending one. Failures are logged, never raised to the caller.
+    """
+
+    def __init__(self, client: SlackAsyncClient, logger: logging.Logger):
+        self.client = client
+        self.logger = logger
+        self._pending: Dict[str, Deque[_Effect]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._scheduled = 0
+        self._coalesced = 0
+        self._executed = 0
+        self._failed = 0
+
+    def add_reaction(self, event: SlackEvent, reaction: str) -> None:
+        self._schedule(f"{event.channel}-{event.data['ts']}", _Effect(
+            REACTION_ADD, reaction, lambda: self.client.add_reaction(event, reaction)))
+
+    def remove_reaction(self, event: SlackEvent, reaction: str) -> None:
+        self._schedule(f"{event.channel}-{event.data['ts']}", _Effect(
+            REACTION_REMOVE, reaction, lambda: self.client.remove_reaction(event, reaction)))
+
+    def set_status(self, event: SlackEvent, status: str, set_status: Optional[Callable[[str], Awaitable[Any]]] = None) -> None:
+        """Set the assistant thread status, with bolt's set_status of the incoming event when given."""
+        thread_ts = event.data["thread_ts"] if "thread_ts" in event.data else event.data["ts"]
+        self._schedule(f"{event.channel}-{thread_ts}", _Effect(STATUS, status, lambda: set_status(
+            status) if set_status is not None else self.client.set_status(event, status)))
+
+    def update_message(self, event: SlackEvent, ts: str, update: Callable[[], Awaitable[Any]]) -> None:
+        """Run update, which edits the reply ts, after the effects scheduled on it before."""
+        self._schedule(f"{event.channel}-{ts}", _Effect(UPDATE, ts, update))
+
+    def _schedule(self, key: str, effect: _Effect) -> None:
+        self._scheduled += 1
+        pending = self._pending.setdefault(key, deque())
+        for queued in reversed(pending):
+            if effect.kind == STATUS and queued.kind == STATUS:
+                pending.remove(queued)
+                self._coalesced += 1
+                break
+            if effect.kind in _OPPOSITES and queued.kind in _OPPOSITES and queued.name == effect.name:
+                if queued.kind == _OPPOSITES[effect.kind]:
+                    pending.remove(queued)
+                    self._coalesced += 2
+                    self.logger.debug("slack side effects cancelled out", key=key,
+                                      kind=effect.kind, name=effect.name)
+                    return
+                break
+        pending.append(effect)
+
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _run(self, key: str) -> None:
+        pending = self._pending[key]
+        try:
+            while pending:
+                effect = pending.popleft()
+                try:
+                    await effect.run()
+                    self._executed += 1
+                except Exception as e:
+                    self._failed += 1
+                    self.logger.warning("slack side effect failed", key=key,
+                                        kind=effect.kind, name=effect.name, error=str(e))
+        finally:
+            del self._tasks[key]
+            del self._pending[key]
+
+    async def drain(self, timeout: float) -> None:
+        if self._tasks:
+            _, pending = await asyncio.wait(list(self._tasks.values()), timeout=timeout)
+            if pending:
+                self.logger.warning("slack side effects drain timed out",
+                                    timeout=timeout, pending=len(pending))
+                for task in pending:
+                    task.cancel()
+        self.logger.info("slack side effects stats", **self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "scheduled": self._scheduled,
+            "coalesced": self._coalesced,
+            "executed": self._executed,
+            "failed": self._failed,
+            "in_flight": len(self._tasks),
+        }
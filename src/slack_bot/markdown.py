@@ -0,0 +1,167 @@
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+# slack renders markdown blocks up to 12000 characters per message, leave room for the references
+DEFAULT_MAX_LENGTH = 10000
+
+# every branch starts with ` [ or *, and no group wraps a whole branch, so the regex engine can skip
+# ahead to those characters. italic checks the character before its opening * with a lookbehind placed
+# after it for the same reason
+INLINE_PATTERN = re.compile(r"""
+    `[^`\n]+`
+  | \[([^\]\n]+)\]\(([^)\s]+)\)
+  | \*\*([^*\n]+)\*\*
+  | \*(?<![*\w]\*)([^*\s][^*\n]*)\*(?!\*)
+""", re.VERBOSE)
+
+BULLET_PATTERN = re.compile(r"^[ \t]*[-*+][ \t]+", re.MULTILINE)
+FENCE_PATTERN = re.compile(r"^[ \t]*```")
+HEADING_PATTERN = re.compile(r"^#{1,6}[ \t]+")
+LIST_ITEM_PATTERN = re.compile(r"^[ \t]*(?:[-*+]|\d+[.)])[ \t]")
+
+
+@dataclass
+class MarkdownChunk:
+    """A part of an answer that fits one slack message, as markdown for its block and as mrkdwn for its fallback text."""
+    markdown: str
+    text: str
+
+
+def _replace_inline(match: re.Match) -> str:
+    token = match.group(0)
+    if token[0] == "[":
+        return f"<{match.group(2)}|{match.group(1)}>"
+    if token[0] == "*":
+        return f"*{match.group(3)}*" if match.group(3) is not None else f"_{match.group(4)}_"
+    # code spans are kept as is
+    return token
+
+
+def _iter_units(markdown: str) -> Iterator[Tuple[str, List[str]]]:
+    """Group lines into code blocks, headings, lists and paragraphs, each with its trailing blank lines."""
+    kind, lines = "", []
+    for line in markdown.splitlines(keepends=True):
+        # plain string checks first, most lines are paragraph text
+        stripped = line.lstrip(" \t")
+        if kind == "fence":
+            lines.append(line)
+            if len(lines) > 1 and stripped.startswith("```"):
+                yield kind, lines
+                kind, lines = "", []
+            continue
+
+        if not stripped.strip():
+            lines.append(line)
+            # a blank line ends a paragraph, while a list goes on with the next item
+            if kind in ("paragraph", "heading"):
+                yield kind, lines
+                kind, lines = "", []
+            continue
+
+        first = stripped[0]
+        is_item = (first in "-*+" and stripped[1:2] in (" ", "\t")) or \
+            (first.isdigit() and LIST_ITEM_PATTERN.match(stripped) is not None)
+        if first == "`" and stripped.startswith("```"):
+            next_kind = "fence"
+        elif first == "#" and HEADING_PATTERN.match(line):
+            next_kind = "heading"
+        elif kind == "list" and (is_item or line[0] in " \t"):
+            lines.append(line)
+            continue
+        elif kind == "paragraph" and not is_item:
+            lines.append(line)
+            continue
+        else:
+            next_kind = "list" if is_item else "paragraph"
+
+        if kind or lines:
+            yield kind or "paragraph", lines
+        kind, lines = next_kind, [line]
+
+    if lines:
+        yield kind or "paragraph", lines
+
+
+def _unit_to_mrkdwn(kind: str, markdown: str) -> str:
+    match kind:
+        case "fence":
+            # mrkdwn has no language tags and code is left as is
+            return "```" + markdown[markdown.index("\n"):] if "\n" in markdown else "```"
+        case "heading":
+            title = HEADING_PATTERN.sub("", markdown).rstrip("\n").replace("**", "")
+            return f"*{INLINE_PATTERN.sub(_replace_inline, title)}*" + markdown[len(markdown.rstrip("\n")):]
+        case "list":
+            markdown = BULLET_PATTERN.sub("• ", markdown)
+    return INLINE_PATTERN.sub(_replace_inline, markdown)
+
+
+def to_mrkdwn(markdown: str) -> str:
+    """Convert markdown to slack mrkdwn in one pass over its blocks, leaving code untouched."""
+    return "".join(_unit_to_mrkdwn(kind, "".join(lines)) for kind, lines in _iter_units(markdown))
+
+
+def _split_line(line: str, max_length: int) -> Iterator[str]:
+    while len(line) > max_length:
+        cut = line.rfind(" ", 0, max_length)
+        if cut <= max_length // 2:
+            cut = max_length
+        yield line[:cut]
+        line = line[cut:]
+    yield line
+
+
+def _split_unit(kind: str, lines: List[str], max_length: int) -> Iterator[str]:
+    """Split a block longer than max_length between its lines, closing and reopening a code block around each cut."""
+    opener, closer = "", ""
+    if kind == "fence":
+        opener = lines[0]
+        lines = lines[1:]
+        if lines and FENCE_PATTERN.match(lines[-1]):
+            closer = lines.pop()
+    max_body = max_length - len(opener) - len("```\n")
+
+    body = ""
+    for line in lines:
+        for piece in _split_line(line, max_body):
+            if len(body) + len(piece) > max_body:
+                yield opener + body + ("```\n" if opener else "")
+                body = ""
+            body += piece
+    yield opener + body + closer
+
+
+def render_markdown(markdown: str, max_length: int = DEFAULT_MAX_LENGTH) -> List[MarkdownChunk]:
+    """
+    Render an answer into chunks of at most max_length characters, each fitting a slack message.
+
+    Chunks end between paragraphs, lists and code blocks where possible. Only a single block longer than
+    max_length is cut between its lines, or inside a line when the line itself is too long.
+    """
+    chunks: List[MarkdownChunk] = []
+    current: List[Tuple[str, str]] = []
+    length = 0
+
+    def flush() -> None:
+        nonlocal current, length
+        if any(part.strip() for part, _ in current):
+            chunks.append(MarkdownChunk(markdown="".join(part for part, _ in current).strip("\n"),
+                                        text="".join(text for _, text in current).strip("\n")))
+        current, length = [], 0
+
+    for kind, lines in _iter_units(markdown):
+        unit = "".join(lines)
+        if length + len(unit) > max_length:
+            flush()
+        if len(unit) <= max_length:
+            current.append((unit, _unit_to_mrkdwn(kind, unit)))
+            length += len(unit)
+            continue
+        *pieces, last = _split_unit(kind, lines, max_length)
+        for piece in pieces:
+            chunks.append(MarkdownChunk(markdown=piece.strip("\n"),
+                                        text=_unit_to_mrkdwn(kind, piece).strip("\n")))
+        current, length = [(last, _unit_to_mrkdwn(kind, last))], len(last)
+    flush()
+
+    return chunks or [MarkdownChunk(markdown=markdown.strip("\n"), text=to_mrkdwn(markdown).strip("\n"))]
@@ -0,0 +1,107 @@
+import time
+import asyncio
+import signal
+import logging
+import multiprocessing
+from typing import Dict, Optional
+
+from config import SlackConfig, AgentConfig
+from config.agent import CheckpointerProvider, StoreProvider
+
+
+def run_worker(worker: int, workers: int) -> None:
+    # imported here so that spawned workers load the bot and its config on their own
+    from .__main__ import main
+    asyncio.run(main(worker, workers))
+
+
+class WorkerSupervisor:
+    """
+    Run a bot process per worker, each opening its own Socket Mode connection.
+
+    Slack delivers every event to one of the app's connections, so the workers share sessions, dedupe and
+    the reply index through the configured store. Exit signals are forwarded to the workers, which drain
+    their in-flight events before exiting. A worker that dies on its own is restarted with exponential
+    backoff, reset once it stayed up for a minute.
+    """
+
+    max_restart_delay = 30.0
+    healthy_uptime = 60.0
+
+    def __init__(self, workers: int, slack_config: SlackConfig, agent_config: AgentConfig, logger: logging.Logger):
+        self.workers = workers
+        self.slack_config = slack_config
+        self.agent_config = agent_config
+        self.logger = logger
+        # spawn instead of fork so no client or thread state leaks from the supervisor into the workers
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._started_at: Dict[int, float] = {}
+        self._failures: Dict[int, int] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._shutting_down = False
+
+    def run(self) -> None:
+        if self.agent_config.checkpointer_provider == CheckpointerProvider.MEMORY or self.agent_config.get_store_provider() == StoreProvider.MEMORY:
+            self.logger.warning("running several workers with in-memory state, sessions and dedupe are not shared between them",
+                                workers=self.workers, checkpointer_provider=self.agent_config.checkpointer_provider.value,
+                                store_provider=self.agent_config.get_store_provider().value)
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._shutdown)
+
+        for worker in range(self.workers):
+            self._start(worker)
+
+        while not self._shutting_down:
+            for worker, process in list(self._processes.items()):
+                process.join(timeout=1.0 / self.workers)
+                if self._shutting_down or process.is_alive():
+                    continue
+                if worker not in self._restart_at:
+                    self._schedule_restart(worker, process)
+                elif time.monotonic() >= self._restart_at[worker]:
+                    del self._restart_at[worker]
+                    self._start(worker)
+
+        self._stop()
+
+    def _start(self, worker: int) -> None:
+        process = self._context.Process(
+            target=run_worker, args=(worker, self.workers), name=f"slack-bot-{worker}")
+        process.start()
+        self._processes[worker] = process
+        self._started_at[worker] = time.monotonic()
+        self.logger.info("worker started", worker=worker, pid=process.pid)
+
+    def _schedule_restart(self, worker: int, process: multiprocessing.Process) -> None:
+        if time.monotonic() - self._started_at[worker] >= self.healthy_uptime:
+            self._failures[worker] = 0
+        self._failures[worker] = self._failures.get(worker, 0) + 1
+        delay = min(2.0 ** (self._failures[worker] - 1),
+                    self.max_restart_delay)
+        self._restart_at[worker] = time.monotonic() + delay
+        self.logger.error("worker exited unexpectedly, restarting", worker=worker,
+                          exitcode=process.exitcode, failures=self._failures[worker], delay=delay)
+
+    def _shutdown(self, sig: int, _: Optional[object]) -> None:
+        self.logger.info("received exit signal, stopping workers",
+                         sig=signal.Signals(sig).name)
+        self._shutting_down = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    def _stop(self) -> None:
+        # workers drain their events and flush the tracker before exiting
+        deadline = time.monotonic() + self.slack_config.event_drain_timeout + \
+            self.agent_config.tracking_flush_timeout + 10
+        for worker, process in self._processes.items():
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.logger.warning("worker did not stop in time, killing",
+                                    worker=worker, pid=process.pid)
+                process.kill()
+                process.join()
+            self.logger.info("worker stopped", worker=worker,
+                             exitcode=process.exitcode)
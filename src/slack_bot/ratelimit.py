@@ -0,0 +1,183 @@
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from slack_sdk.errors import SlackApiError
+
+T = TypeVar("T")
+
+# requests per minute of the web api rate limit tiers, see https://api.slack.com/apis/rate-limits
+TIER_1 = 1
+TIER_2 = 20
+TIER_3 = 50
+TIER_4 = 100
+
+METHOD_RATE_LIMITS: Dict[str, float] = {
+    "conversations.history": TIER_3,
+    "conversations.replies": TIER_3,
+    "chat.update": TIER_3,
+    "chat.delete": TIER_3,
+    "reactions.add": TIER_3,
+    "reactions.remove": TIER_2,
+    "assistant.threads.setStatus": TIER_3,
+}
+
+# methods limited per channel rather than per workspace
+CHANNEL_RATE_LIMITS: Dict[str, float] = {
+    "chat.postMessage": 60,
+}
+
+DEFAULT_RATE_LIMIT = TIER_3
+
+
+@dataclass
+class _Bucket:
+    rate: float
+    burst: float
+    tokens: float
+    updated_at: float
+    blocked_until: float = 0.0
+
+
+@dataclass
+class _MethodStats:
+    calls: int = 0
+    waits: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+    rate_limited: int = 0
+
+
+class SlackRateLimiter:
+    """
+    Schedule slack web api calls under the per-method rate limits, shared by every client of the process.
+
+    Each method has a token bucket refilled at its tier's rate, and methods limited per channel get one
+    bucket per channel. A call takes a token and sleeps until the token is due, so bursts are spread out
+    instead of running into 429s. When slack still answers 429, the bucket is paused for exactly the
+    Retry-After seconds and the call is retried. The bucket state is guarded by a lock and the waiting is
+    done outside of it, so the sync and the async clients can share one limiter.
+
+    Slack's limits are per app, so with several bot processes each one gets an equal share of every
+    rate and burst.
+    """
+
+    def __init__(self, logger: logging.Logger, rate_limits: Optional[Dict[str, float]] = None, burst: float = 3, max_retries: int = 5,
+                 processes: int = 1):
+        self.logger = logger
+        self.rate_limits = {**METHOD_RATE_LIMITS,
+                            **CHANNEL_RATE_LIMITS, **(rate_limits or {})}
+        self.processes = max(processes, 1)
+        # a bucket holds at least one token, or no call could ever be made
+        self.burst = max(burst / self.processes, 1.0)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, Optional[str]], _Bucket] = {}
+        self._stats: Dict[str, _MethodStats] = {}
+
+    @staticmethod
+    def get_method(func: Callable[..., Any]) -> str:
+        """Map a WebClient method such as assistant_threads_setStatus to its api method name."""
+        return func.__name__.replace("_", ".")
+
+    def reserve(self, method: str, channel: Optional[str] = None) -> float:
+        """Take a token from the method's bucket and return the number of seconds to wait before calling."""
+        key = (method, channel if method in CHANNEL_RATE_LIMITS else None)
+        now = time.monotonic()
+        with self._lock:
+            if (bucket := self._buckets.get(key)) is None:
+                rate = self.rate_limits.get(
+                    method, DEFAULT_RATE_LIMIT) / 60 / self.processes
+                bucket = self._buckets[key] = _Bucket(
+                    rate=rate, burst=self.burst, tokens=self.burst, updated_at=now)
+            bucket.tokens = min(
+                bucket.burst, bucket.tokens + (now - bucket.updated_at) * bucket.rate)
+            bucket.updated_at = now
+            bucket.tokens -= 1
+            wait = max(-bucket.tokens / bucket.rate,
+                       bucket.blocked_until - now, 0.0)
+
+            stats = self._stats.setdefault(method, _MethodStats())
+            stats.calls += 1
+            if wait > 0:
+                stats.waits += 1
+                stats.wait_time_total += wait
+                stats.wait_time_max = max(stats.wait_time_max, wait)
+        return wait
+
+    def blocked_for(self, method: str, channel: Optional[str] = None) -> float:
+        """Return the seconds left of a Retry-After pause that started after the call took its token."""
+        key = (method, channel if method in CHANNEL_RATE_LIMITS else None)
+        with self._lock:
+            return max(self._buckets[key].blocked_until - time.monotonic(), 0.0)
+
+    def pause(self, method: str, channel: Optional[str], error: SlackApiError) -> float:
+        """Block the method's bucket for the Retry-After of a 429 response and return it."""
+        retry_after = 1.0
+        for name, value in error.response.headers.items():
+            # the sync client keeps the header as sent, possibly as a list of values
+            if name.lower() == "retry-after":
+                retry_after = float(value[0] if isinstance(value, list) else value)
+        key = (method, channel if method in CHANNEL_RATE_LIMITS else None)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets[key]
+            bucket.blocked_until = max(
+                bucket.blocked_until, now + retry_after)
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.updated_at = now
+            self._stats[method].rate_limited += 1
+        self.logger.warning("slack api rate limited", method=method,
+                            channel=channel, retry_after=retry_after)
+        return retry_after
+
+    def _should_retry(self, error: SlackApiError, attempt: int) -> bool:
+        return error.response.status_code == 429 and attempt < self.max_retries
+
+    def call(self, func: Callable[..., T], channel: Optional[str] = None, **kwargs: Any) -> T:
+        method = self.get_method(func)
+        attempt = 0
+        while True:
+            attempt += 1
+            if (wait := self.reserve(method, channel)) > 0:
+                time.sleep(wait)
+            while (wait := self.blocked_for(method, channel)) > 0:
+                time.sleep(wait)
+            try:
+                return func(channel=channel, **kwargs) if channel is not None else func(**kwargs)
+            except SlackApiError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                self.pause(method, channel, e)
+
+    async def acall(self, func: Callable[..., Awaitable[T]], channel: Optional[str] = None, **kwargs: Any) -> T:
+        method = self.get_method(func)
+        attempt = 0
+        while True:
+            attempt += 1
+            if (wait := self.reserve(method, channel)) > 0:
+                await asyncio.sleep(wait)
+            while (wait := self.blocked_for(method, channel)) > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await (func(channel=channel, **kwargs) if channel is not None else func(**kwargs))
+            except SlackApiError as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                self.pause(method, channel, e)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                method: {
+                    "calls": stats.calls,
+                    "waits": stats.waits,
+                    "wait_time_avg": round(stats.wait_time_total / stats.waits, 3) if stats.waits else 0.0,
+                    "wait_time_max": round(stats.wait_time_max, 3),
+                    "rate_limited": stats.rate_limited,
+                }
+                for method, stats in self._stats.items()
+            }
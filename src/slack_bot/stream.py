@@ -0,0 +1,159 @@
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from slack_sdk.errors import SlackApiError
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+from config import SlackConfig
+from agent.parser import Reference
+from agent.supervisor import SUPERVISOR_NAME
+from .client import SlackAsyncClient
+from .effects import SlackSideEffects
+from .types import SlackEvent
+
+INLINE_AGENT_NAME_PATTERN = re.compile(r"<name>.*?</name>|</?content>", re.DOTALL)
+
+
+def content_to_text(content: str | List[str | Dict[str, Any]]) -> str:
+    if isinstance(content, str):
+        return content
+    texts = []
+    for item in content:
+        match item:
+            case str():
+                texts.append(item)
+            case {"type": "text", "text": str() as text}:
+                texts.append(text)
+    return "".join(texts)
+
+
+class SlackStreamingReply:
+    """
+    Show the supervisor's answer in slack while the agent is still running.
+
+    Tokens of the supervisor's own messages are collected and pushed with chat.update at most once every
+    stream_update_interval seconds. A message that turns into a tool call (a hand-off to a sub agent) is
+    dropped from the preview. In assistant mode the thread status shows progress until the first answer
+    token, then the reply is posted and updated like in the other modes.
+    """
+
+    def __init__(self, client: SlackAsyncClient, effects: SlackSideEffects, config: SlackConfig, event: SlackEvent,
+                 in_replies: bool, logger: logging.Logger):
+        self.client = client
+        self.effects = effects
+        self.config = config
+        self.event = event
+        self.in_replies = in_replies
+        self.logger = logger
+        self.ts: Optional[str] = None
+
+        self._started_at = time.monotonic()
+        self._first_token_at: Optional[float] = None
+        self._agent_name: Optional[str] = None
+        self._message_id: Optional[str] = None
+        self._message_text = ""
+        self._message_has_tool_calls = False
+        self._text = ""
+        self._pushed_text = ""
+        self._flusher: Optional[asyncio.Task] = None
+        # held by a periodic flush, so stop() can wait for a post or update in progress instead of cutting it off
+        self._flush_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._started_at = time.monotonic()
+        if not self.config.assistant:
+            placeholder = self.config.get_message("assistant_thinking")
+            self.ts = await self.client.reply_blocks(self.event, placeholder, [{
+                "type": "markdown",
+                "text": placeholder
+            }], in_replies=self.in_replies)
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def on_message(self, message: BaseMessage, metadata: Dict[str, Any]) -> None:
+        agent_name = metadata.get("langgraph_checkpoint_ns", "").split(":", 1)[0]
+        if agent_name != self._agent_name:
+            self._agent_name = agent_name
+            if self.config.assistant and self.ts is None and agent_name != SUPERVISOR_NAME:
+                self.effects.set_status(self.event, self.config.get_message("assistant_delegating").format(agent=agent_name))
+
+        if agent_name != SUPERVISOR_NAME or not isinstance(message, AIMessage):
+            return
+
+        if message.id != self._message_id:
+            self._message_id = message.id
+            self._message_text = ""
+            self._message_has_tool_calls = False
+
+        if message.tool_calls or getattr(message, "tool_call_chunks", None):
+            self._message_has_tool_calls = True
+            self._text = ""
+            return
+
+        text = content_to_text(message.content)
+        if isinstance(message, AIMessageChunk):
+            self._message_text += text
+        else:
+            self._message_text = text
+
+        if not self._message_has_tool_calls and self._message_text.strip():
+            self._text = INLINE_AGENT_NAME_PATTERN.sub(
+                "", self._message_text).strip()
+
+    async def finish(self, content: str, references: List[Reference]) -> List[str]:
+        await self.stop()
+        if self.ts is None:
+            ts = await self.client.reply_markdown(self.event, content, references, in_replies=self.in_replies)
+            self.ts = ts[0]
+        else:
+            ts = await self.client.update_markdown(self.event, self.ts, content, references, final=True, in_replies=self.in_replies)
+        self.logger.info("streaming reply finished", ts=ts, elapsed=round(time.monotonic() - self._started_at, 3),
+                         first_token=round(self._first_token_at - self._started_at, 3) if self._first_token_at else None)
+        return ts
+
+    async def abort(self) -> None:
+        await self.stop()
+        if self.ts is not None:
+            try:
+                await self.client.delete_message(self.event, self.ts)
+            except SlackApiError as e:
+                self.logger.warning(
+                    "failed to delete streaming reply", ts=self.ts, error=str(e))
+            self.ts = None
+
+    async def stop(self) -> None:
+        """Stop the periodic flush once the one in progress, if any, has posted or updated the reply."""
+        if self._flusher is None:
+            return
+        flusher, self._flusher = self._flusher, None
+        async with self._flush_lock:
+            # the flusher is now sleeping or waiting for the lock, cancelling it cannot interrupt a slack call
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.stream_update_interval)
+            async with self._flush_lock:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        text = self._text
+        if not text or text == self._pushed_text:
+            return
+        try:
+            if self.ts is None:
+                chunk = self.client.render_markdown(text)[0]
+                self.ts = await self.client.reply_blocks(self.event, chunk.text, self.client.build_markdown_blocks(
+                    chunk.markdown, disclaimer=False), in_replies=self.in_replies)
+            else:
+                await self.client.update_markdown(self.event, self.ts, text)
+        except SlackApiError as e:
+            self.logger.warning(
+                "failed to update streaming reply", ts=self.ts, error=str(e))
+            return
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+        self._pushed_text = text
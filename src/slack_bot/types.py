@@ -109,6 +109,7 @@ class SlackChannelHistoryPage(TypedDict):
 class SlackChannelHistory(TypedDict):
     channel: str
     pages: List[SlackChannelHistoryPage]
+    next_cursor: Optional[str]
 
 
 class SlackEventType(Enum):
@@ -0,0 +1,146 @@
+import time
+import asyncio
+import logging
+from enum import Enum
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+
+from .types import SlackEvent
+
+
+class EventLane(Enum):
+    FEEDBACK = "feedback"
+    ASSISTANT = "assistant"
+    DEFAULT = "default"
+
+
+class _Lane:
+    def __init__(self, workers: int, max_size: int):
+        if workers < 1:
+            raise ValueError(f"Invalid event worker count: {workers}")
+        self.workers = workers
+        self.max_size = max_size
+        self.ready: asyncio.Queue[str] = asyncio.Queue()
+        self.depth = 0
+        self.in_flight = 0
+        self.accepted = 0
+        self.shed = 0
+        self.processed = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+
+class EventWorkerPool:
+    """
+    Run slack events concurrently on bounded lanes of workers.
+
+    Each lane has its own workers, so cheap feedback events never wait behind expensive agent runs.
+    A lane accepts at most max_size events waiting to start; beyond that put() sheds the event and
+    returns False. Events sharing the same key (channel or thread) are processed strictly in the order
+    they were put, one at a time: a key is in a ready queue at most once, so a worker never picks up an
+    event whose predecessor is still in flight.
+    """
+
+    def __init__(self, handler: Callable[[SlackEvent], Awaitable[None]], lanes: Dict[EventLane, Tuple[int, int]], logger: logging.Logger):
+        self.handler = handler
+        self.logger = logger
+        self._lanes = {lane: _Lane(workers, max_size)
+                       for lane, (workers, max_size) in lanes.items()}
+        self._pending: Dict[str, Tuple[EventLane, Deque[Tuple[SlackEvent, float]]]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    def start(self) -> None:
+        for lane, state in self._lanes.items():
+            for idx in range(state.workers):
+                self._tasks.append(asyncio.create_task(
+                    self._worker(lane, idx)))
+
+    def put(self, key: str, event: SlackEvent, lane: EventLane = EventLane.DEFAULT) -> bool:
+        if self._closed:
+            self.logger.warning("event worker pool closed, dropping event",
+                                key=key, event_type=event.type.value)
+            return False
+
+        if key in self._pending:
+            # keep the key in the lane of its first pending event to preserve ordering
+            lane, events = self._pending[key]
+        else:
+            events = None
+        state = self._lanes[lane]
+
+        if state.depth >= state.max_size:
+            state.shed += 1
+            self.logger.warning("event queue full, shedding event", key=key, lane=lane.value,
+                                event_type=event.type.value, depth=state.depth, shed=state.shed)
+            return False
+
+        state.depth += 1
+        state.accepted += 1
+        if events is not None:
+            events.append((event, time.monotonic()))
+        else:
+            self._pending[key] = (lane, deque([(event, time.monotonic())]))
+            state.ready.put_nowait(key)
+        return True
+
+    async def _worker(self, lane: EventLane, idx: int) -> None:
+        self.logger.info("event worker started", lane=lane.value, worker=idx)
+        state = self._lanes[lane]
+        while True:
+            key = await state.ready.get()
+            _, events = self._pending[key]
+            event, enqueued_at = events[0]
+            wait_time = time.monotonic() - enqueued_at
+            state.depth -= 1
+            state.in_flight += 1
+            state.wait_time_total += wait_time
+            state.wait_time_max = max(state.wait_time_max, wait_time)
+            self.logger.info("event dequeued", lane=lane.value, worker=idx, key=key,
+                             wait_time=round(wait_time, 3), depth=state.depth)
+            try:
+                await self.handler(event)
+            except Exception as e:
+                self.logger.exception(
+                    f"error in worker: {e}", lane=lane.value, worker=idx, key=key)
+            finally:
+                state.in_flight -= 1
+                state.processed += 1
+                events.popleft()
+                if events:
+                    state.ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                state.ready.task_done()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            lane.value: {
+                "depth": state.depth,
+                "in_flight": state.in_flight,
+                "accepted": state.accepted,
+                "shed": state.shed,
+                "processed": state.processed,
+                "wait_time_avg": round(state.wait_time_total / state.processed, 3) if state.processed else 0.0,
+                "wait_time_max": round(state.wait_time_max, 3),
+            }
+            for lane, state in self._lanes.items()
+        }
+
+    async def drain(self, timeout: float) -> bool:
+        self._closed = True
+        drained = True
+        try:
+            await asyncio.wait_for(asyncio.gather(*[state.ready.join() for state in self._lanes.values()]), timeout)
+            self.logger.info("all event processing tasks completed")
+        except asyncio.TimeoutError:
+            drained = False
+            self.logger.warning("event worker pool drain timed out", timeout=timeout,
+                                pending=sum(len(events) for _, events in self._pending.values()))
+        self.logger.info("event worker pool stats", stats=self.stats())
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        return drained
@@ -0,0 +1,7 @@
+from .base import BaseStore
+from .memory import MemoryStore
+from .mongodb import MongoDBStore
+from .session import SessionStore
+from .title import TitleStore
+
+__all__ = ["BaseStore", "MemoryStore", "MongoDBStore", "SessionStore", "TitleStore"]
@@ -0,0 +1,31 @@
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Tuple
+
+
+class BaseStore(ABC):
+    """
+    An async key-value store with per-entry expiry.
+
+    Every backend must make set_if_absent atomic, so that concurrent events racing for the same key all
+    end up with the same value.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        return NotImplemented
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        return NotImplemented
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> Tuple[Any, bool]:
+        """Return the stored value and whether it was created by this call. Refreshes the expiry of the entry."""
+        return NotImplemented
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        return NotImplemented
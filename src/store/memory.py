@@ -0,0 +1,60 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from .base import BaseStore
+
+
+class MemoryStore(BaseStore):
+    """An in-process LRU store. Entries expire after ttl seconds and the least recently used ones are evicted beyond max_size."""
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        ttl = ttl if ttl is not None else self.ttl
+        return time.monotonic() + ttl if ttl is not None else None
+
+    def _get(self, key: str) -> Tuple[Optional[Any], bool]:
+        if (entry := self._entries.get(key)) is None:
+            return None, False
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None, False
+        self._entries.move_to_end(key)
+        return value, True
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, self._expires_at(ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)[0]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> Tuple[Any, bool]:
+        with self._lock:
+            existing, found = self._get(key)
+            if found:
+                self._set(key, existing, ttl)
+                return existing, False
+            self._set(key, value, ttl)
+            return value, True
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
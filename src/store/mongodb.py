@@ -0,0 +1,94 @@
+import datetime
+from typing import Any, Optional, Tuple
+
+from pymongo import AsyncMongoClient, MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .base import BaseStore
+
+
+class MongoDBStore(BaseStore):
+    """
+    A store backed by one MongoDB collection, shared by every bot process.
+
+    Documents look like {"_id": key, "value": value, "expires_at": datetime}. A TTL index removes expired
+    documents; reads also filter on expires_at because the TTL monitor only runs once a minute.
+
+    Given a sync client, get_sync and set_sync read and write the same documents for callers without an
+    event loop.
+    """
+
+    def __init__(self, client: AsyncMongoClient, database: str, collection: str, ttl: Optional[float] = None,
+                 sync_client: Optional[MongoClient] = None):
+        super().__init__(ttl)
+        self.collection = client[database][collection]
+        self.sync_collection = sync_client[database][collection] if sync_client is not None else None
+        self._indexed = False
+        self._sync_indexed = False
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[datetime.datetime]:
+        ttl = ttl if ttl is not None else self.ttl
+        if ttl is None:
+            return None
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl)
+
+    @staticmethod
+    def _not_expired() -> dict:
+        return {"$or": [
+            {"expires_at": None},
+            {"expires_at": {"$gt": datetime.datetime.now(datetime.timezone.utc)}},
+        ]}
+
+    async def _ensure_index(self) -> None:
+        if not self._indexed:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+    async def get(self, key: str) -> Optional[Any]:
+        document = await self.collection.find_one({"_id": key, **self._not_expired()})
+        return document["value"] if document is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._ensure_index()
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": self._expires_at(ttl)}},
+            upsert=True,
+        )
+
+    async def set_if_absent(self, key: str, value: Any, ttl: Optional[float] = None) -> Tuple[Any, bool]:
+        await self._ensure_index()
+        await self.collection.delete_one({"_id": key, "expires_at": {"$lte": datetime.datetime.now(datetime.timezone.utc)}})
+        try:
+            document = await self.collection.find_one_and_update(
+                {"_id": key},
+                {
+                    "$setOnInsert": {"value": value},
+                    "$set": {"expires_at": self._expires_at(ttl)},
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            # another replica inserted the same key between our find and insert
+            document = await self.collection.find_one({"_id": key})
+        if document is None:
+            return value, True
+        return document["value"], False
+
+    async def delete(self, key: str) -> None:
+        await self.collection.delete_one({"_id": key})
+
+    def get_sync(self, key: str) -> Optional[Any]:
+        document = self.sync_collection.find_one({"_id": key, **self._not_expired()})
+        return document["value"] if document is not None else None
+
+    def set_sync(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if not self._sync_indexed:
+            self.sync_collection.create_index("expires_at", expireAfterSeconds=0)
+            self._sync_indexed = True
+        self.sync_collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": self._expires_at(ttl)}},
+            upsert=True,
+        )
@@ -0,0 +1,13 @@
+from .base import BaseStore
+
+
+class SessionStore:
+    """Map a slack channel or thread to the agent session (checkpointer thread id) it belongs to."""
+
+    def __init__(self, store: BaseStore):
+        self.store = store
+
+    async def get_or_create(self, session_key: str, session_id: str) -> str:
+        session_id, _ = await self.store.set_if_absent(session_key, session_id)
+        return session_id
+
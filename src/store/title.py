@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .base import BaseStore
+from .mongodb import MongoDBStore
+
+
+class TitleStore:
+    """
+    Map the content of a conversation, by hash, to the title generated for it.
+
+    Titles are kept in an in-process LRU in front of the store. Sync callers such as the MCP server and the
+    RAG loader cannot await the store; they go through the store's sync client when it is a MongoDB store
+    opened with one, and only reuse the titles of this process otherwise.
+    """
+
+    def __init__(self, store: BaseStore, max_size: int):
+        self.store = store
+        self.max_size = max_size
+        self._titles: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(content: str) -> str:
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            if (title := self._titles.get(key)) is not None:
+                self._titles.move_to_end(key)
+            return title
+
+    def set_local(self, key: str, title: str) -> None:
+        with self._lock:
+            self._titles[key] = title
+            self._titles.move_to_end(key)
+            while len(self._titles) > self.max_size:
+                self._titles.popitem(last=False)
+
+    def _get_sync_store(self) -> Optional[MongoDBStore]:
+        if isinstance(self.store, MongoDBStore) and self.store.sync_collection is not None:
+            return self.store
+        return None
+
+    def get_sync(self, key: str) -> Optional[str]:
+        if (title := self.get_local(key)) is not None:
+            return title
+        if (store := self._get_sync_store()) is not None and (title := store.get_sync(key)) is not None:
+            self.set_local(key, title)
+        return title
+
+    def set_sync(self, key: str, title: str) -> None:
+        self.set_local(key, title)
+        if (store := self._get_sync_store()) is not None:
+            store.set_sync(key, title)
+
+    async def get(self, key: str) -> Optional[str]:
+        if (title := self.get_local(key)) is not None:
+            return title
+        if (title := await self.store.get(key)) is not None:
+            self.set_local(key, title)
+        return title
+
+    async def set(self, key: str, title: str) -> None:
+        self.set_local(key, title)
+        await self.store.set(key, title)
@@ -7,7 +7,7 @@ import streamlit as st
 from langchain.schema.runnable.config import RunnableConfig
 from langchain_core.messages import HumanMessage
 
-from agent.supervisor import create_supervisor_graph
+from agent.supervisor import get_supervisor_graph
 from agent.parser import parse_agent_result
 from config import AgentConfig, SlackConfig
 
@@ -136,7 +136,7 @@ for idx, prompt in enumerate(get_agent_config().get_message_dicts("assistant_gre
 if st.session_state["is_thinking"] and st.session_state["messages"][-1]["role"] == "user":
     with st.chat_message("assistant"):
         with st.spinner(text=get_agent_config().get_message("assistant_thinking"), show_time=True):
-            graph = create_supervisor_graph(
+            graph = get_supervisor_graph(
                 get_agent_config(), get_slack_config())
             message_id = st.session_state["messages"][-1]["metadata"]["id"]
             runnable_config = get_agent_config().get_tracker().inject_runnable_config(RunnableConfig(
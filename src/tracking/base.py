@@ -1,9 +1,14 @@
+import logging
 from enum import Enum
+from typing import List
 from abc import ABC, abstractmethod
 
+from pydantic import BaseModel
 from emoji_sentiment import EmojiSentiment
 from langchain_core.runnables import RunnableConfig
 
+from .exporter import BatchExporter
+
 
 class Score(Enum):
     EMOJI_FEEDBACK = "emoji_feedback"
@@ -15,9 +20,29 @@ class Dataset(Enum):
     EMOJI_UNSCORED = "emoji_unscored"
 
 
+class EmojiFeedback(BaseModel):
+    message_id: str
+    user_id: str
+    message: str
+    reply_message: str
+    emoji_name: str
+    source: str
+
+    @property
+    def id(self) -> str:
+        return f"{self.source}:{self.message_id}:{self.user_id}:{self.emoji_name}"
+
+
 class BaseTracker(ABC):
     emoji_sentiment = EmojiSentiment(round_to=4)
 
+    def __init__(self, logger: logging.Logger, buffer_size: int = 1000, batch_size: int = 20, flush_interval: float = 5.0,
+                 max_tries: int = 5, flush_timeout: float = 30.0):
+        self.logger = logger
+        self.flush_timeout = flush_timeout
+        self.exporter = BatchExporter(self.export_emoji_feedbacks, logger, buffer_size=buffer_size,
+                                      batch_size=batch_size, flush_interval=flush_interval, max_tries=max_tries)
+
     def inject_runnable_config(self, config: RunnableConfig) -> RunnableConfig:
         if "callbacks" not in config:
             config["callbacks"] = []
@@ -25,9 +50,14 @@ class BaseTracker(ABC):
             config["metadata"] = {}
         return config
 
+    def collect_emoji_feedback(self, message_id: str, user_id: str, message: str, reply_message: str, emoji_name: str, source: str) -> bool:
+        return self.exporter.submit(EmojiFeedback(message_id=message_id, user_id=user_id, message=message,
+                                                  reply_message=reply_message, emoji_name=emoji_name, source=source))
+
     @abstractmethod
-    def collect_emoji_feedback(self, message_id: str, user_id: str, message: str, reply_message: str, emoji_name: str, source: str) -> None:
+    def export_emoji_feedbacks(self, feedbacks: List[EmojiFeedback]) -> None:
+        """Write a batch of feedbacks to the tracking backend. Must be safe to retry."""
         return NotImplemented
 
-    def flush() -> None:
-        pass
+    def flush(self) -> None:
+        self.exporter.flush(self.flush_timeout)
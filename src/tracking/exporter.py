@@ -0,0 +1,120 @@
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Generic, List, TypeVar
+
+import backoff
+
+T = TypeVar("T")
+
+
+class BatchExporter(Generic[T]):
+    """
+    Export tracker records in batches from a background thread.
+
+    submit() only appends to a bounded buffer, so the caller never waits on the tracking backend. When the
+    buffer is full the record is dropped and counted. A batch is exported once it reaches batch_size or
+    flush_interval seconds after its first record, and retried with exponential backoff up to max_tries
+    times before it is dropped. A thread is used instead of an asyncio task so the same pipeline serves
+    the slack bot's event loop and the synchronous streamlit pages.
+    """
+
+    def __init__(self, export: Callable[[List[T]], None], logger: logging.Logger, buffer_size: int = 1000,
+                 batch_size: int = 20, flush_interval: float = 5.0, max_tries: int = 5):
+        self.export = export
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_tries = max_tries
+
+        self.submitted = 0
+        self.exported = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue[T] = queue.Queue(maxsize=buffer_size)
+        self._flush_requested = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="tracker-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: T) -> bool:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self.logger.warning("tracker export buffer full, dropping record",
+                                dropped=self.dropped)
+            return False
+        self.submitted += 1
+        return True
+
+    def flush(self, timeout: float) -> bool:
+        """Export everything submitted so far, waiting at most timeout seconds."""
+        deadline = time.monotonic() + timeout
+        self._flush_requested.set()
+        try:
+            while self._queue.unfinished_tasks:
+                if time.monotonic() >= deadline:
+                    self.logger.warning("tracker export flush timed out", timeout=timeout,
+                                        pending=self._queue.unfinished_tasks)
+                    return False
+                time.sleep(0.05)
+            return True
+        finally:
+            self._flush_requested.clear()
+            self.logger.info("tracker export stats", stats=self.stats())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.unfinished_tasks,
+            "submitted": self.submitted,
+            "exported": self.exported,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                self._export_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self) -> List[T]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            if self._flush_requested.is_set() or time.monotonic() >= deadline:
+                break
+            try:
+                batch.append(self._queue.get(
+                    timeout=min(0.05, max(0.0, deadline - time.monotonic()))))
+            except queue.Empty:
+                pass
+        return batch
+
+    def _export_batch(self, batch: List[T]) -> None:
+        export = backoff.on_exception(
+            backoff.expo, Exception, max_tries=self.max_tries, logger=None,
+            on_backoff=lambda details: self.logger.warning(
+                "tracker export failed, retrying", tries=details["tries"], wait=round(details["wait"], 3),
+                size=len(batch), error=str(details["exception"])))(self.export)
+        try:
+            export(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            self.logger.exception(f"tracker export failed, dropping batch: {e}",
+                                  size=len(batch), failed=self.failed)
+            return
+        self.exported += len(batch)
+        self.logger.debug("tracker export batch exported",
+                          size=len(batch), exported=self.exported)
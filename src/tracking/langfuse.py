@@ -1,13 +1,15 @@
+from typing import List
+
 from langchain_core.runnables import RunnableConfig
 from langfuse.client import DatasetStatus
 
 from config.client import LangfuseConfig
-from .base import BaseTracker, Score, Dataset
+from .base import BaseTracker, EmojiFeedback, Score, Dataset
 
 
 class LangfuseTracker(BaseTracker):
-    def __init__(self, config: LangfuseConfig):
-        self.logger = config.get_logger()
+    def __init__(self, config: LangfuseConfig, **kwargs):
+        super().__init__(config.get_logger(), **kwargs)
         self.langfuse = config.get_langfuse_client()
         self.langfuse_callback_handler = config.get_langfuse_callback_handler()
 
@@ -33,39 +35,41 @@ class LangfuseTracker(BaseTracker):
             config["metadata"]["langfuse_session_id"] = config["metadata"]["session_id"]
         return config
 
-    def collect_emoji_feedback(self, message_id: str, user_id: str,  message: str, reply_message: str, emoji_name: str, source: str) -> None:
-        if (emoji := self.emoji_sentiment.get(emoji_name)) is None:
-            self.logger.warning("no sentiment score found for emoji",
-                                message_id=message_id, message=message, reply_message=reply_message, emoji_name=emoji_name, source=source)
-            self.langfuse.create_dataset_item(
-                dataset_name=Dataset.EMOJI_UNSCORED.value,
-                id=f"{source}:{emoji_name}",
-                source_trace_id=message_id,
-                status=DatasetStatus.ACTIVE,
-            )
-            return
+    def export_emoji_feedbacks(self, feedbacks: List[EmojiFeedback]) -> None:
+        # scores and dataset items are upserted by id, so a retried batch does not duplicate records
+        for feedback in feedbacks:
+            if (emoji := self.emoji_sentiment.get(feedback.emoji_name)) is None:
+                self.logger.warning("no sentiment score found for emoji", **feedback.model_dump())
+                self.langfuse.create_dataset_item(
+                    dataset_name=Dataset.EMOJI_UNSCORED.value,
+                    id=f"{feedback.source}:{feedback.emoji_name}",
+                    source_trace_id=feedback.message_id,
+                    status=DatasetStatus.ACTIVE,
+                )
+                continue
 
-        self.langfuse.score(
-            id=f"{source}:{message_id}:{user_id}:{emoji_name}",
-            name=Score.EMOJI_FEEDBACK.value,
-            data_type="NUMERIC",
-            value=emoji.score,
-            trace_id=message_id
-        )
+            self.langfuse.score(
+                id=feedback.id,
+                name=Score.EMOJI_FEEDBACK.value,
+                data_type="NUMERIC",
+                value=emoji.score,
+                trace_id=feedback.message_id
+            )
 
-        self.logger.info(f"received user {"positive" if emoji.score >= 0 else "negative"} feedback",
-                         message_id=message_id, user_id=user_id, message=message, reply_message=reply_message, emoji=emoji, source=source)
+            self.logger.info(f"received user {"positive" if emoji.score >= 0 else "negative"} feedback",
+                             emoji=emoji, **feedback.model_dump())
 
-        self.langfuse.create_dataset_item(
-            dataset_name=Dataset.EMOJI_FEEDBACK_POSITIVE.value if emoji.score >= 0 else Dataset.EMOJI_FEEDBACK_NEGATIVE.value,
-            id=f"{source}:{message_id}:{user_id}:{emoji_name}",
-            input=message,
-            expected_output=reply_message,
-            source_trace_id=message_id,
-            metadata={"emoji": emoji.model_dump()},
-            status=DatasetStatus.ACTIVE,
-        )
+            self.langfuse.create_dataset_item(
+                dataset_name=Dataset.EMOJI_FEEDBACK_POSITIVE.value if emoji.score >= 0 else Dataset.EMOJI_FEEDBACK_NEGATIVE.value,
+                id=feedback.id,
+                input=feedback.message,
+                expected_output=feedback.reply_message,
+                source_trace_id=feedback.message_id,
+                metadata={"emoji": emoji.model_dump()},
+                status=DatasetStatus.ACTIVE,
+            )
 
     def flush(self) -> None:
+        super().flush()
         self.langfuse.shutdown()
         self.langfuse_callback_handler.flush()
@@ -1,13 +1,17 @@
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List
+
 from langchain_core.runnables import RunnableConfig
 from langsmith.utils import LangSmithConflictError
 
 from config.client import LangSmithConfig
-from .base import BaseTracker, Score, Dataset
+from .base import BaseTracker, EmojiFeedback, Score, Dataset
 
 
 class LangSmithTracker(BaseTracker):
-    def __init__(self, config: LangSmithConfig):
-        self.logger = config.get_logger()
+    def __init__(self, config: LangSmithConfig, **kwargs):
+        super().__init__(config.get_logger(), **kwargs)
         self.config = config
         self.langsmith = config.get_langsmith_client()
 
@@ -40,40 +44,55 @@ class LangSmithTracker(BaseTracker):
         config["metadata"]["version"] = self.config.version
         return config
 
-    def collect_emoji_feedback(self, message_id: str, user_id: str,  message: str, reply_message: str, emoji_name: str, source: str) -> None:
-        if (emoji := self.emoji_sentiment.get(emoji_name)) is None:
-            self.logger.warning("no sentiment score found for emoji",
-                                message_id=message_id, message=message, reply_message=reply_message, emoji_name=emoji_name, source=source)
-            self.langsmith.create_example(
-                dataset_name=Dataset.EMOJI_UNSCORED.value,
-                inputs={"message": message},
-                outputs={"reply_message": reply_message},
-                source_run_id=message_id,
-                metadata={"user_id": user_id,
-                          "emoji_name": emoji_name, "source": source}
-            )
-            return
+    def export_emoji_feedbacks(self, feedbacks: List[EmojiFeedback]) -> None:
+        # ids are derived from the feedback so a retried batch neither duplicates feedback nor examples
+        examples: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for feedback in feedbacks:
+            example = {
+                "id": uuid.uuid5(uuid.NAMESPACE_URL, feedback.id),
+                "inputs": {"message": feedback.message},
+                "outputs": {"reply_message": feedback.reply_message},
+                "source_run_id": feedback.message_id,
+            }
+
+            if (emoji := self.emoji_sentiment.get(feedback.emoji_name)) is None:
+                self.logger.warning("no sentiment score found for emoji", **feedback.model_dump())
+                examples[Dataset.EMOJI_UNSCORED.value].append({**example, "metadata": {
+                    "user_id": feedback.user_id, "emoji_name": feedback.emoji_name, "source": feedback.source}})
+                continue
+
+            try:
+                self.langsmith.create_feedback(
+                    feedback.message_id,
+                    key=Score.EMOJI_FEEDBACK.value,
+                    score=emoji.score,
+                    feedback_id=example["id"],
+                    extra={"user_id": feedback.user_id, "emoji": emoji.model_dump(),
+                           "source": feedback.source}
+                )
+            except LangSmithConflictError:
+                pass
 
-        self.langsmith.create_feedback(
-            message_id,
-            key=Score.EMOJI_FEEDBACK.value,
-            score=emoji.score,
-            extra={"user_id": user_id, "emoji": emoji.model_dump(),
-                   "source": source}
-        )
+            self.logger.info(f"received user {"positive" if emoji.score >= 0 else "negative"} feedback",
+                             emoji=emoji, **feedback.model_dump())
 
-        self.logger.info(f"received user {"positive" if emoji.score >= 0 else "negative"} feedback",
-                         message_id=message_id, user_id=user_id, message=message, reply_message=reply_message, emoji=emoji, source=source)
+            examples[Dataset.EMOJI_FEEDBACK_POSITIVE.value if emoji.score >= 0 else Dataset.EMOJI_FEEDBACK_NEGATIVE.value].append({
+                **example, "metadata": {"user_id": feedback.user_id, "emoji": emoji.model_dump(), "source": feedback.source}})
 
-        self.langsmith.create_example(
-            dataset_name=Dataset.EMOJI_FEEDBACK_POSITIVE.value if emoji.score >= 0 else Dataset.EMOJI_FEEDBACK_NEGATIVE.value,
-            inputs={"message": message},
-            outputs={"reply_message": reply_message},
-            source_run_id=message_id,
-            metadata={"user_id": user_id, "emoji": emoji.model_dump(),
-                      "source": source}
-        )
+        for dataset_name, dataset_examples in examples.items():
+            try:
+                self.langsmith.create_examples(
+                    dataset_name=dataset_name, examples=dataset_examples)
+            except LangSmithConflictError:
+                # some examples were exported by an earlier attempt, the batch is rejected as a whole
+                for example in dataset_examples:
+                    try:
+                        self.langsmith.create_examples(
+                            dataset_name=dataset_name, examples=[example])
+                    except LangSmithConflictError:
+                        pass
 
     def flush(self) -> None:
+        super().flush()
         self.langsmith.flush()
         self.langsmith.cleanup()